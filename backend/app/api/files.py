@@ -0,0 +1,74 @@
+"""Serving of stored files under /files.
+
+Blob paths (``blobs/ab/<sha256>.ext``) never change content, so they are
+served with the digest as a strong ETag and a long-lived ``immutable``
+Cache-Control: browsers and proxies reuse them without revalidating. Older
+paths, whose names do not pin their content, are served with ``no-cache``
+and revalidated through ETag / Last-Modified, answered with a 304.
+
+Range and If-Range requests, HEAD and the ASGI ``pathsend`` extension (the
+server sends the file itself, e.g. with sendfile) come from Starlette's
+FileResponse. Without ``pathsend`` files are streamed in FILES_CHUNK_SIZE
+chunks.
+
+When the storage backend hands out presigned URLs (s3), requests are
+redirected there instead and the bytes never pass through the API; other
+remote backends are served from the local copy, fetched on first use.
+"""
+import asyncio
+import os
+from pathlib import PurePosixPath
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, RedirectResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.config import settings
+from app.services.object_storage import get_storage_backend
+from app.services.storage import blob_digest, local_path, presigned_url
+
+
+class _FileResponse(FileResponse):
+    chunk_size = settings.FILES_CHUNK_SIZE
+
+
+class FileServer(StaticFiles):
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        # Hidden files include uploads still being written (".<uuid>.tmp")
+        if any(part.startswith(".") for part in PurePosixPath(path).parts):
+            raise HTTPException(status_code=404)
+        if get_storage_backend().remote and scope["method"] in ("GET", "HEAD"):
+            url = await asyncio.to_thread(presigned_url, path)
+            if url:
+                # Re-signing on every view would defeat the browser cache
+                max_age = settings.PRESIGNED_URL_EXPIRES_SECONDS // 2
+                return RedirectResponse(
+                    url, status_code=307, headers={"cache-control": f"private, max-age={max_age}"}
+                )
+            await asyncio.to_thread(local_path, path)
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike[str],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        digest = blob_digest(str(full_path))
+        if digest:
+            headers = {
+                "etag": f'"{digest}"',
+                "cache-control": f"public, max-age={settings.FILES_MAX_AGE_SECONDS}, immutable",
+            }
+        else:
+            headers = {"cache-control": "no-cache"}
+
+        response = _FileResponse(
+            full_path, status_code=status_code, headers=headers, stat_result=stat_result
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
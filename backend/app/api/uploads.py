@@ -0,0 +1,153 @@
+"""Multipart file uploads read straight from the request stream.
+
+An ``UploadFile`` parameter makes Starlette parse the whole body and spool it
+to a temporary file before the endpoint runs, so a size limit can only be
+checked once every byte has arrived, and storing the file copies it again.
+``stream_upload`` instead rejects a declared Content-Length over the limit
+before reading anything, then hands the file field's bytes to the caller as
+they arrive and stops reading at the limit.
+"""
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.services.storage import UploadTooLarge
+
+# Multipart framing and small form fields next to the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+def upload_openapi(field: str) -> dict:
+    """``openapi_extra`` documenting the body of an endpoint using stream_upload."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": [field],
+                        "properties": {field: {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    }
+
+
+@dataclass
+class StreamedUpload:
+    filename: str | None
+    content_type: str | None
+    chunks: AsyncIterator[bytes]  # the file's bytes; consume once
+
+
+class _FieldReader:
+    """Feeds the request body to the parser, keeping one file field's data."""
+
+    def __init__(self, request: Request, field: str, boundary: bytes, max_bytes: int):
+        self.field = field
+        self.max_body = max_bytes + FORM_OVERHEAD_BYTES
+        self.body = request.stream()
+        self.received = 0
+        self.data: list[bytes] = []
+        self.found: StreamedUpload | None = None
+        self.done = False  # the field's last byte has been parsed
+
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_field = False
+        self.parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._in_field = self.found is None and name == self.field and b"filename" in options
+        if self._in_field:
+            content_type = self._headers.get(b"content-type")
+            self.found = StreamedUpload(
+                filename=options[b"filename"].decode("utf-8", "replace") or None,
+                content_type=content_type.decode("latin-1") if content_type else None,
+                chunks=self._chunks(),
+            )
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_field:
+            self.data.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_field:
+            self._in_field = False
+            self.done = True
+
+    async def feed(self) -> bool:
+        """Parse the next piece of the body; False once the body has ended."""
+        try:
+            chunk = await self.body.__anext__()
+        except StopAsyncIteration:
+            return False
+        self.received += len(chunk)
+        if self.received > self.max_body:
+            raise UploadTooLarge("Request body exceeds the upload limit")
+        self.parser.write(chunk)
+        return True
+
+    async def _chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            data, self.data = self.data, []
+            for piece in data:
+                yield piece
+            if self.done:
+                return
+            if not await self.feed():
+                raise HTTPException(status_code=400, detail="Incomplete multipart body")
+
+
+async def stream_upload(request: Request, field: str, max_bytes: int) -> StreamedUpload:
+    """The file sent as ``field`` of a multipart/form-data request, unread.
+
+    Raises UploadTooLarge when the declared or received body exceeds
+    ``max_bytes`` plus FORM_OVERHEAD_BYTES (the caller's store enforces
+    ``max_bytes`` on the file itself) and a 400 HTTPException when the
+    request carries no such file.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + FORM_OVERHEAD_BYTES:
+        raise UploadTooLarge("Request body exceeds the upload limit")
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    reader = _FieldReader(request, field, options[b"boundary"], max_bytes)
+    while reader.found is None:
+        if not await reader.feed():
+            raise HTTPException(status_code=400, detail=f"Missing file field '{field}'")
+    return reader.found
@@ -0,0 +1,190 @@
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session, col, func, select
+
+from app.config import settings
+from app.database import get_session
+from app.models.db import Campaign, Generation, GenerationResult, Image, Product, Target
+from app.models.schemas import CampaignCreate, CampaignRead
+from app.services.job_queue import get_job_queue
+from app.services.pipeline import IN_FLIGHT_STATUSES
+from app.services.prompt_builder import DESIGN_STYLE_DIRECTIVES
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/campaigns", tags=["campaigns"])
+
+
+@router.post("", response_model=CampaignRead)
+def create_campaign(
+    body: CampaignCreate,
+    session: Session = Depends(get_session),
+):
+    """Expand products × design styles into one generation per cell.
+
+    Each cell covers every requested target. Cells whose analysis inputs
+    are identical share one analysis/brief: the first such cell is queued
+    and the rest follow it once its analysis is stored.
+    """
+    if not body.source_image_id and not body.promotion_prompt:
+        raise HTTPException(
+            status_code=422,
+            detail="프로모션 설명 또는 참고 이미지 중 하나는 필수입니다.",
+        )
+    if not body.target_ids:
+        raise HTTPException(status_code=422, detail="At least one target is required")
+
+    if body.source_image_id and not session.get(Image, body.source_image_id):
+        raise HTTPException(status_code=404, detail="Source image not found")
+
+    product_sets = list(dict.fromkeys(tuple(ids) for ids in body.product_sets)) or [()]
+    for pid in {pid for ids in product_sets for pid in ids}:
+        if not session.get(Product, pid):
+            raise HTTPException(status_code=404, detail=f"Product {pid} not found")
+
+    for tid in body.target_ids:
+        if not session.get(Target, tid):
+            raise HTTPException(status_code=404, detail=f"Target {tid} not found")
+
+    design_styles = list(dict.fromkeys(body.design_styles)) or [None]
+    for style in design_styles:
+        if style is not None and style not in DESIGN_STYLE_DIRECTIVES:
+            raise HTTPException(status_code=422, detail=f"Unknown design style '{style}'")
+
+    cell_count = len(product_sets) * len(design_styles)
+    if cell_count > settings.CAMPAIGN_MAX_CELLS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Campaign has {cell_count} cells; the limit is {settings.CAMPAIGN_MAX_CELLS}",
+        )
+
+    mode = "derive" if body.source_image_id else "create"
+    campaign = Campaign(
+        name=body.name,
+        source_image_id=body.source_image_id,
+        promotion_prompt=body.promotion_prompt,
+        product_sets=json.dumps([list(ids) for ids in product_sets]),
+        design_styles=json.dumps(design_styles),
+        target_ids=json.dumps(body.target_ids),
+        priority=body.priority,
+    )
+    session.add(campaign)
+    session.commit()
+    session.refresh(campaign)
+
+    # Image analysis does not depend on the design style; creative briefs do
+    leaders: dict[tuple, Generation] = {}
+    for product_ids in product_sets:
+        for style in design_styles:
+            key = (product_ids, style if mode == "create" else None)
+            leader = leaders.get(key)
+            generation = Generation(
+                campaign_id=campaign.id,
+                source_image_id=body.source_image_id,
+                product_id=product_ids[0] if product_ids else None,
+                product_ids=json.dumps(list(product_ids)) if product_ids else None,
+                promotion_prompt=body.promotion_prompt,
+                design_style=style,
+                mode=mode,
+                priority=body.priority,
+                analysis_leader_id=leader.id if leader else None,
+            )
+            session.add(generation)
+            session.flush()
+            leaders.setdefault(key, generation)
+            for tid in body.target_ids:
+                session.add(GenerationResult(generation_id=generation.id, target_id=tid))
+    session.commit()
+
+    queue = get_job_queue()
+    for leader in leaders.values():
+        queue.enqueue(
+            "generation",
+            {"generation_id": leader.id},
+            generation_id=leader.id,
+            priority=leader.priority,
+        )
+    logger.info(
+        f"Campaign {campaign.id}: {cell_count} cells, {len(leaders)} analyses, "
+        f"{cell_count * len(body.target_ids)} images"
+    )
+    return _campaign_read(session, campaign)
+
+
+@router.get("/{campaign_id}", response_model=CampaignRead)
+def get_campaign(campaign_id: int, session: Session = Depends(get_session)):
+    campaign = session.get(Campaign, campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return _campaign_read(session, campaign)
+
+
+def _campaign_status(statuses: list[str]) -> str:
+    if any(status in IN_FLIGHT_STATUSES for status in statuses):
+        return "pending" if all(status == "pending" for status in statuses) else "running"
+    if all(status == "completed" for status in statuses):
+        return "completed"
+    if all(status == "cancelled" for status in statuses):
+        return "cancelled"
+    return "failed"
+
+
+def _campaign_read(session: Session, campaign: Campaign) -> dict:
+    generations = session.exec(
+        select(Generation)
+        .where(Generation.campaign_id == campaign.id)
+        .order_by(Generation.id)
+    ).all()
+    counts: dict[int, dict[str, int]] = {}
+    for generation_id, status, count in session.exec(
+        select(GenerationResult.generation_id, GenerationResult.status, func.count())
+        .where(col(GenerationResult.generation_id).in_([g.id for g in generations]))
+        .group_by(GenerationResult.generation_id, GenerationResult.status)
+    ).all():
+        counts.setdefault(generation_id, {})[status] = count
+
+    totals: dict[str, int] = {}
+    cells = []
+    for generation in generations:
+        by_status = counts.get(generation.id, {})
+        for status, count in by_status.items():
+            totals[status] = totals.get(status, 0) + count
+        cells.append(
+            {
+                "generation_id": generation.id,
+                "product_ids": json.loads(generation.product_ids) if generation.product_ids else [],
+                "design_style": generation.design_style,
+                "status": generation.status,
+                "analysis_leader_id": generation.analysis_leader_id,
+                "results_completed": by_status.get("completed", 0),
+                "results_total": sum(by_status.values()),
+            }
+        )
+
+    results_total = sum(totals.values())
+    results_finished = sum(totals.get(s, 0) for s in ("completed", "failed", "cancelled"))
+    statuses = [g.status for g in generations]
+    status = _campaign_status(statuses)
+    finished_at = [g.completed_at for g in generations if g.completed_at]
+
+    campaign_dict = campaign.model_dump()
+    campaign_dict.update(
+        product_sets=json.loads(campaign.product_sets),
+        design_styles=json.loads(campaign.design_styles),
+        target_ids=json.loads(campaign.target_ids),
+        status=status,
+        completed_at=max(finished_at) if status not in ("pending", "running") and finished_at else None,
+        progress={
+            "cells_total": len(generations),
+            "cells_finished": sum(1 for s in statuses if s not in IN_FLIGHT_STATUSES),
+            "results_total": results_total,
+            "results_completed": totals.get("completed", 0),
+            "results_failed": totals.get("failed", 0),
+            "results_cancelled": totals.get("cancelled", 0),
+            "percent": round(100 * results_finished / results_total, 1) if results_total else 0.0,
+        },
+        cells=cells,
+    )
+    return campaign_dict
@@ -1,33 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
 
+from app.api.uploads import stream_upload, upload_openapi
+from app.config import settings
 from app.database import get_session
 from app.models.db import Image
 from app.models.schemas import ImageRead
-from app.services.storage import save_upload
+from app.services.renditions import schedule_renditions
+from app.services.storage import UnsupportedFileType, UploadTooLarge, save_upload
 
 router = APIRouter(prefix="/images", tags=["images"])
 
 
-@router.post("/upload", response_model=ImageRead)
-async def upload_image(
-    file: UploadFile,
-    session: Session = Depends(get_session),
-):
-    if not file.content_type or not file.content_type.startswith("image/"):
+@router.post("/upload", response_model=ImageRead, openapi_extra=upload_openapi("file"))
+async def upload_image(request: Request, session: Session = Depends(get_session)):
+    # Read from the request stream: an UploadFile parameter would buffer the
+    # whole body before a size limit could apply
+    try:
+        upload = await stream_upload(request, "file", settings.MAX_UPLOAD_BYTES)
+        if not upload.content_type or not upload.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail="File must be an image")
+        stored_path, size_bytes, mime_type = await save_upload(upload.chunks)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="File is too large")
+    except UnsupportedFileType:
         raise HTTPException(status_code=400, detail="File must be an image")
 
-    stored_path, size_bytes = await save_upload(file, subdir="originals")
-
     image = Image(
-        filename=file.filename or "unknown",
+        filename=upload.filename or "unknown",
         stored_path=stored_path,
-        mime_type=file.content_type,
+        mime_type=mime_type,
         size_bytes=size_bytes,
     )
     session.add(image)
     session.commit()
     session.refresh(image)
+    schedule_renditions(Image, image.id, stored_path)
     return image
 
 
@@ -1,12 +1,14 @@
 import json
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlmodel import Session, select
 
+from app.config import settings
 from app.database import get_session
 from app.models.db import Image, Product
 from app.models.schemas import ProductCreate, ProductRead, ProductUpdate
+from app.services.product_images import prefetch_product_image
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +21,11 @@ def list_products(session: Session = Depends(get_session)):
 
 
 @router.post("", response_model=ProductRead)
-def create_product(body: ProductCreate, session: Session = Depends(get_session)):
+def create_product(
+    body: ProductCreate,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session),
+):
     if body.image_id:
         img = session.get(Image, body.image_id)
         if not img:
@@ -37,6 +43,9 @@ def create_product(body: ProductCreate, session: Session = Depends(get_session))
     session.add(product)
     session.commit()
     session.refresh(product)
+    if settings.PRODUCT_IMAGE_PREFETCH and product.image_url and not product.image_id:
+        # Download now rather than on the first generation's critical path
+        background_tasks.add_task(prefetch_product_image, product.id)
     return product
 
 
@@ -52,6 +61,7 @@ def get_product(product_id: int, session: Session = Depends(get_session)):
 def update_product(
     product_id: int,
     body: ProductUpdate,
+    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
 ):
     product = session.get(Product, product_id)
@@ -73,12 +83,15 @@ def update_product(
         if not img:
             raise HTTPException(status_code=404, detail="Product image not found")
         product.image_id = body.image_id
+    url_changed = body.image_url is not None and body.image_url != product.image_url
     if body.image_url is not None:
         product.image_url = body.image_url
 
     session.add(product)
     session.commit()
     session.refresh(product)
+    if settings.PRODUCT_IMAGE_PREFETCH and url_changed and body.image_id is None:
+        background_tasks.add_task(prefetch_product_image, product.id)
     return product
 
 
@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 from app.database import get_session
 from app.models.db import Target
 from app.models.schemas import TargetCreate, TargetRead, TargetUpdate
+from app.services.text_adapter import invalidate_adapted_copy
 
 router = APIRouter(prefix="/targets", tags=["targets"])
 
@@ -57,6 +58,8 @@ def update_target(
     session.add(target)
     session.commit()
     session.refresh(target)
+    # Copy memoized for the old persona must not be reused
+    invalidate_adapted_copy(target_id)
     return target
 
 
@@ -68,4 +71,5 @@ def delete_target(target_id: int, session: Session = Depends(get_session)):
 
     session.delete(target)
     session.commit()
+    invalidate_adapted_copy(target_id)
     return {"ok": True}
@@ -6,8 +6,122 @@ class Settings(BaseSettings):
     GCP_LOCATION: str = "us-central1"
     DATABASE_URL: str = "sqlite:///./fitpromo.db"
     UPLOAD_DIR: str = "./uploads"
+    MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024  # larger uploads are rejected with 413
+
+    # Object storage behind UPLOAD_DIR (see services/object_storage.py)
+    STORAGE_BACKEND: str = "local"  # "local" | "s3" | "memory" (in-process fake)
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = ""
+    S3_ENDPOINT_URL: str = ""  # e.g. http://localhost:9000 for MinIO; empty for AWS
+    S3_REGION: str = ""
+    PRESIGNED_URL_EXPIRES_SECONDS: int = 3600  # /files redirects to URLs valid this long
+
+    # /files serving (see api/files.py)
+    FILES_MAX_AGE_SECONDS: int = 365 * 86400  # Cache-Control max-age for immutable blob paths
+    FILES_CHUNK_SIZE: int = 1 << 20  # read size when the server cannot send files itself
+
+    # Renditions of uploaded and generated images (see services/renditions.py)
+    RENDITIONS_ENABLED: bool = True
+    # Longest side in px per rendition; 0 keeps the original size
+    RENDITION_SIZES: dict[str, int] = {"thumb": 320, "medium": 1024, "full": 0}
+    RENDITION_FORMATS: list[str] = ["webp", "avif"]
+    RENDITION_QUALITY: int = 80
+    RENDITION_WORKERS: int = 2  # encoder processes
     ALLOWED_ORIGINS: str = "http://localhost:3000"
 
+    # Pipeline concurrency
+    GENERATION_STAGE_CONCURRENCY: int = 6  # model-bound stages in flight per generation
+    STAGE_POOL_SIZES: dict[str, int] = {"pro": 8, "image": 4}  # process-wide, per model
+    STAGE_POOL_DEFAULT_SIZE: int = 4
+    BATCH_TEXT_ADAPTATION: bool = True  # adapt copy for all targets in one call
+    BATCH_RATIONALE: bool = False  # generate rationales in batches after all images
+    RATIONALE_BATCH_SIZE: int = 8  # targets per batched rationale request
+
+    # Priority classes: interactive previews are served ahead of bulk sweeps,
+    # sharing queue claims, stage pools and rate limits by these weights
+    DEFAULT_PRIORITY: str = "interactive"
+    PRIORITY_WEIGHTS: dict[str, float] = {"interactive": 4, "bulk": 1}
+
+    # Campaigns (products × design styles matrix)
+    CAMPAIGN_MAX_CELLS: int = 100
+
+    # Offline bulk mode: bulk-priority Gemini calls go through batch prediction
+    BULK_EXECUTION_MODE: str = "online"  # "online" | "batch"
+    BATCH_BACKEND: str = "local"  # "local" (file-based stand-in) | "vertex"
+    BATCH_LOCAL_DIR: str = "./batch_jobs"
+    BATCH_GCS_URI: str = ""  # gs://bucket/prefix for the vertex backend
+    BATCH_MAX_REQUESTS: int = 200  # flush a model's batch at this many requests
+    BATCH_FLUSH_SECONDS: float = 30.0  # ...or this long after the first request
+    BATCH_POLL_SECONDS: float = 30.0
+    BATCH_DEADLINE_SECONDS: float = 86400.0  # replaces GENERATION_DEADLINE_SECONDS in batch mode
+    # Bulk jobs a worker keeps parked on batch results, apart from WORKER_CONCURRENCY
+    BATCH_WORKER_CONCURRENCY: int = 100
+
+    # Content-addressed cache of model outputs (see services/result_cache.py)
+    CACHE_DEFAULT_TTL_SECONDS: float = 30 * 86400
+    CACHE_TTL_SECONDS: dict[str, float] = {}  # per-namespace overrides, e.g. {"analysis": 604800}
+    CACHE_MAX_ENTRIES: int = 5000  # per namespace, least recently used evicted first
+    # Link an earlier completed result's image when prompt, reference images,
+    # model, aspect ratio and size all match (a generation can opt out with regenerate)
+    REUSE_GENERATED_IMAGES: bool = False
+
+    # Near-duplicate promotion prompts (see services/prompt_similarity.py):
+    # "off", "suggest" (record the closest earlier prompt on the generation) or
+    # "reuse" (also reuse that prompt's creative brief at or above the threshold)
+    PROMPT_SIMILARITY_MODE: str = "suggest"
+    PROMPT_SIMILARITY_THRESHOLD: float = 0.8  # estimated Jaccard similarity of shingles
+
+    # Reference images are downsized and re-encoded once before being sent
+    REFERENCE_IMAGE_MAX_SIDE: int = 1536  # px, longest side
+    REFERENCE_IMAGE_QUALITY: int = 90  # JPEG quality
+    REFERENCE_IMAGE_MEMO_SIZE: int = 64  # prepared images kept in memory
+
+    # Timeouts and cancellation
+    GEMINI_CALL_TIMEOUT: float = 180.0  # seconds per Gemini request attempt
+    GENERATION_DEADLINE_SECONDS: float = 1800.0  # measured from the start of each run
+    CANCEL_POLL_SECONDS: float = 2.0  # how often workers check for cancelled generations
+
+    # Outbound HTTP (product pages and images) through one pooled client
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    # Product images from image_url (see services/product_images.py)
+    PRODUCT_IMAGE_PREFETCH: bool = True  # download when a product is created or its URL changes
+    PRODUCT_IMAGE_REVALIDATE_SECONDS: float = 86400.0  # conditional GET once older than this
+    PRODUCT_IMAGE_RETRY_BASE_SECONDS: float = 60.0  # wait after a failed download, doubling
+    PRODUCT_IMAGE_RETRY_MAX_SECONDS: float = 21600.0
+
+    # Shared Gemini client connection pool
+    GENAI_MAX_CONNECTIONS: int = 32
+    GENAI_KEEPALIVE_SECONDS: float = 60.0
+
+    # Vertex AI rate limiting (per model token bucket with AIMD)
+    RATE_LIMIT_RPM: dict[str, float] = {
+        "gemini-3.1-pro-preview": 60,
+        "gemini-3.1-flash-image-preview": 20,
+    }
+    RATE_LIMIT_DEFAULT_RPM: float = 30
+    RATE_LIMIT_MIN_RPM: float = 2
+    RATE_LIMIT_BURST: float = 4
+    RATE_LIMIT_INCREASE_RPM: float = 1  # additive increase per success
+    RATE_LIMIT_DECREASE_FACTOR: float = 0.5  # multiplicative decrease per 429
+    RATE_LIMIT_MAX_RETRIES: int = 5
+    RATE_LIMIT_BACKOFF_BASE: float = 2.0  # seconds
+    RATE_LIMIT_BACKOFF_MAX: float = 60.0  # seconds
+
+    # Job queue / workers
+    JOB_QUEUE_BACKEND: str = "sqlite"
+    JOB_LEASE_SECONDS: float = 120.0
+    JOB_HEARTBEAT_SECONDS: float = 30.0
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 3
+    WORKER_CONCURRENCY: int = 2  # jobs claimed at once per worker process
+    EMBEDDED_WORKER: bool = True  # run a worker inside the API process
+
+    # Crash recovery for generations left in analyzing/generating
+    RECOVERY_INTERVAL_SECONDS: float = 60.0
+    RECOVERY_GRACE_SECONDS: float = 30.0  # ignore generations younger than this
+    RECOVERY_MAX_RESUMES: int = 3
+
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
 
@@ -1,6 +1,7 @@
 import logging
 from collections.abc import Generator
 
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine, text
 
 from app.config import settings
@@ -9,6 +10,16 @@ logger = logging.getLogger(__name__)
 
 engine = create_engine(settings.DATABASE_URL, echo=False)
 
+if engine.dialect.name == "sqlite":
+    # API and worker processes share the database file; WAL lets readers run
+    # alongside the writer and busy_timeout waits out short write locks.
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
@@ -44,6 +55,32 @@ def migrate_db():
                 conn.execute(text("ALTER TABLE generationresult ADD COLUMN adapted_text TEXT"))
                 logger.info("Added 'adapted_text' column to generationresult")
 
+            if "image_key" not in cols:
+                conn.execute(text("ALTER TABLE generationresult ADD COLUMN image_key TEXT"))
+                conn.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS ix_generationresult_image_key "
+                        "ON generationresult (image_key)"
+                    )
+                )
+                logger.info("Added 'image_key' column to generationresult")
+
+            if "reused_from_id" not in cols:
+                conn.execute(text("ALTER TABLE generationresult ADD COLUMN reused_from_id INTEGER"))
+                logger.info("Added 'reused_from_id' column to generationresult")
+
+            if "renditions" not in cols:
+                conn.execute(text("ALTER TABLE generationresult ADD COLUMN renditions TEXT"))
+                logger.info("Added 'renditions' column to generationresult")
+
+        if "image" in table_names:
+            result = conn.execute(text("PRAGMA table_info(image)"))
+            cols = {row[1] for row in result.fetchall()}
+
+            if "renditions" not in cols:
+                conn.execute(text("ALTER TABLE image ADD COLUMN renditions TEXT"))
+                logger.info("Added 'renditions' column to image")
+
         # Add product_id and new fields to generation table
         if "generation" in table_names:
             result = conn.execute(text("PRAGMA table_info(generation)"))
@@ -107,6 +144,68 @@ def migrate_db():
                 conn.execute(text("ALTER TABLE generation_new RENAME TO generation"))
                 logger.info("Rebuilt generation table: source_image_id now nullable")
 
+            if "priority" not in cols:
+                conn.execute(
+                    text("ALTER TABLE generation ADD COLUMN priority TEXT DEFAULT 'interactive'")
+                )
+                logger.info("Added 'priority' column to generation")
+
+            if "force_refresh" not in cols:
+                conn.execute(
+                    text("ALTER TABLE generation ADD COLUMN force_refresh BOOLEAN DEFAULT 0")
+                )
+                logger.info("Added 'force_refresh' column to generation")
+
+            if "campaign_id" not in cols:
+                conn.execute(text("ALTER TABLE generation ADD COLUMN campaign_id INTEGER"))
+                logger.info("Added 'campaign_id' column to generation")
+
+            if "analysis_leader_id" not in cols:
+                conn.execute(text("ALTER TABLE generation ADD COLUMN analysis_leader_id INTEGER"))
+                logger.info("Added 'analysis_leader_id' column to generation")
+
+            if "regenerate" not in cols:
+                conn.execute(text("ALTER TABLE generation ADD COLUMN regenerate BOOLEAN DEFAULT 0"))
+                logger.info("Added 'regenerate' column to generation")
+
+            if "reused_images" not in cols:
+                conn.execute(
+                    text("ALTER TABLE generation ADD COLUMN reused_images INTEGER DEFAULT 0")
+                )
+                logger.info("Added 'reused_images' column to generation")
+
+            if "prompt_similarity" not in cols:
+                conn.execute(text("ALTER TABLE generation ADD COLUMN prompt_similarity FLOAT"))
+                conn.execute(text("ALTER TABLE generation ADD COLUMN similar_generation_id INTEGER"))
+                conn.execute(text("ALTER TABLE generation ADD COLUMN similarity_threshold FLOAT"))
+                conn.execute(
+                    text("ALTER TABLE generation ADD COLUMN brief_reused BOOLEAN DEFAULT 0")
+                )
+                logger.info("Added prompt similarity columns to generation")
+
+            if "started_at" not in cols:
+                conn.execute(text("ALTER TABLE generation ADD COLUMN started_at DATETIME"))
+                logger.info("Added 'started_at' column to generation")
+
+        if "job" in table_names:
+            result = conn.execute(text("PRAGMA table_info(job)"))
+            cols = {row[1] for row in result.fetchall()}
+
+            if "priority" not in cols:
+                conn.execute(text("ALTER TABLE job ADD COLUMN priority TEXT DEFAULT 'interactive'"))
+                logger.info("Added 'priority' column to job")
+
+        if "cacheentry" in table_names:
+            result = conn.execute(text("PRAGMA table_info(cacheentry)"))
+            cols = {row[1] for row in result.fetchall()}
+
+            if "tag" not in cols:
+                conn.execute(text("ALTER TABLE cacheentry ADD COLUMN tag TEXT"))
+                conn.execute(
+                    text("CREATE INDEX IF NOT EXISTS ix_cacheentry_tag ON cacheentry (tag)")
+                )
+                logger.info("Added 'tag' column to cacheentry")
+
         # Add new fields to product table
         if "product" in table_names:
             result = conn.execute(text("PRAGMA table_info(product)"))
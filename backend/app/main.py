@@ -1,19 +1,30 @@
+import asyncio
 import json
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from sqlmodel import Session, select
 
+from app.api.files import FileServer
 from app.api.v1.router import v1_router
 from app.config import settings
 from app.database import create_db_and_tables, migrate_db, engine
 from app.models.db import Product, Target
 from app.prompts.products import BUILTIN_PRODUCTS
 from app.prompts.targets import BUILTIN_TARGETS
-
+from app.services.batch_prediction import batch_stats
+from app.services.genai_client import client_stats, close_clients, init_clients
+from app.services.http_client import close_http_client
+from app.services.product_images import prefetch_product_images, product_image_stats
+from app.services.rate_limiter import limiter_stats
+from app.services.reconciler import run_reconciler
+from app.services.renditions import rendition_stats, shutdown_renditions
+from app.services.result_cache import cache_stats
+from app.services.scheduler import pool_stats
+from app.services.storage import blob_stats
+from app.worker import run_worker
 
 
 def seed_targets():
@@ -89,8 +100,23 @@ async def lifespan(app: FastAPI):
     create_db_and_tables()
     seed_targets()
     seed_products()
+    init_clients()
+
+    stop = asyncio.Event()
+    background = [asyncio.create_task(run_reconciler(stop))]
+    if settings.EMBEDDED_WORKER:
+        background.append(asyncio.create_task(run_worker(stop)))
+    if settings.PRODUCT_IMAGE_PREFETCH:
+        background.append(asyncio.create_task(prefetch_product_images()))
+
     yield
 
+    stop.set()
+    await asyncio.gather(*background)
+    await close_clients()
+    await close_http_client()
+    await shutdown_renditions()
+
 
 app = FastAPI(title="Fit-Promo API", version="0.1.0", lifespan=lifespan)
 
@@ -105,7 +131,7 @@ app.add_middleware(
 
 upload_dir = Path(settings.UPLOAD_DIR)
 upload_dir.mkdir(parents=True, exist_ok=True)
-app.mount("/files", StaticFiles(directory=str(upload_dir)), name="files")
+app.mount("/files", FileServer(directory=str(upload_dir)), name="files")
 
 app.include_router(v1_router)
 
@@ -113,3 +139,17 @@ app.include_router(v1_router)
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "genai_clients": client_stats(),
+        "rate_limits": limiter_stats(),
+        "stage_pools": pool_stats(),
+        "batch_prediction": batch_stats(),
+        "caches": cache_stats(),
+        "product_images": product_image_stats(),
+        "blobs": blob_stats(),
+        "renditions": rendition_stats(),
+    }
@@ -9,6 +9,7 @@ class Image(SQLModel, table=True):
     stored_path: str
     mime_type: str
     size_bytes: int
+    renditions: str | None = None  # JSON {"thumb": {"webp": stored_path, ...}, ...}
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -38,19 +39,71 @@ class Product(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class Blob(SQLModel, table=True):
+    """A content-addressed file under UPLOAD_DIR/blobs (see services/storage.py)."""
+
+    sha256: str = Field(primary_key=True)
+    size_bytes: int
+    ext: str  # extension of the first save, e.g. ".png"
+    refcount: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class RemoteImage(SQLModel, table=True):
+    """Download state of an image URL (product image_url)."""
+
+    id: int | None = Field(default=None, primary_key=True)
+    url: str = Field(index=True, unique=True)
+    image_id: int | None = Field(default=None, foreign_key="image.id")
+    etag: str | None = None
+    last_modified: str | None = None
+    checked_at: datetime | None = None  # last successful fetch or 304
+    failures: int = 0  # consecutive failed attempts
+    retry_after: datetime | None = None  # no new attempt before this
+    last_error: str | None = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class Campaign(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    name: str | None = None
+    source_image_id: int | None = Field(default=None, foreign_key="image.id")
+    promotion_prompt: str | None = None
+    product_sets: str  # JSON array of product id arrays, e.g. "[[1],[2,3]]"
+    design_styles: str  # JSON array, e.g. '["lifestyle","minimal_graphic"]'
+    target_ids: str  # JSON array
+    priority: str = "bulk"
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class Generation(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
+    campaign_id: int | None = Field(default=None, foreign_key="campaign.id", index=True)
+    # Campaign cell whose analysis/brief this one reuses instead of running its own
+    analysis_leader_id: int | None = None
     source_image_id: int | None = Field(default=None, foreign_key="image.id")
     product_id: int | None = Field(default=None, foreign_key="product.id")
     product_ids: str | None = None  # JSON array e.g. "[1,2,3]"
     promotion_prompt: str | None = None
     design_style: str | None = None
     mode: str = "derive"  # "create" | "derive"
+    priority: str = "interactive"  # "interactive" | "bulk"
+    force_refresh: bool = False  # bypass cached analysis/brief/copy for this run
+    regenerate: bool = False  # always pay for new images, even with REUSE_GENERATED_IMAGES
+    reused_images: int = 0  # results that linked an earlier identical image
+    # Closest earlier promotion prompt with the same other brief inputs
+    prompt_similarity: float | None = None
+    similar_generation_id: int | None = None
+    similarity_threshold: float | None = None
+    brief_reused: bool = False  # creative brief taken from the similar prompt
     status: str = "pending"
     model: str = "gemini-3.1-pro-preview"
     analysis_result: str | None = None
     error: str | None = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # When a worker last started running it; the deadline counts from here,
+    # so time spent queued or waiting on a campaign leader is not charged
+    started_at: datetime | None = None
     completed_at: datetime | None = None
 
 
@@ -63,5 +116,47 @@ class GenerationResult(SQLModel, table=True):
     prompt_used: str | None = None
     rationale: str | None = None
     adapted_text: str | None = None
+    # sha256 of prompt, reference image hashes, model, aspect ratio and size
+    image_key: str | None = Field(default=None, index=True)
+    reused_from_id: int | None = None  # result whose stored image was linked
+    renditions: str | None = None  # JSON, same shape as Image.renditions
+    error: str | None = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class Job(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    kind: str
+    payload: str  # JSON
+    generation_id: int | None = Field(default=None, foreign_key="generation.id", index=True)
+    status: str = Field(default="queued", index=True)  # queued | running | completed | failed | cancelled | superseded
+    priority: str = "interactive"
+    attempts: int = 0
+    worker_id: str | None = None
+    lease_expires_at: datetime | None = None
+    heartbeat_at: datetime | None = None
     error: str | None = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class PromptSignature(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    context_key: str = Field(index=True)  # hash of the brief inputs other than the prompt
+    prompt: str
+    signature: str  # JSON array of MinHash values
+    brief_key: str  # "brief" cache key of the brief generated for this prompt
+    generation_id: int | None = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CacheEntry(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    namespace: str = Field(index=True)  # e.g. "analysis"
+    key: str = Field(index=True)  # sha256 of the inputs
+    tag: str | None = Field(default=None, index=True)  # e.g. "target:3", for invalidation
+    value: str
+    hits: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
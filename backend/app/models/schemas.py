@@ -1,6 +1,26 @@
+import json
 from datetime import datetime
+from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
+
+# {"thumb": {"webp": "/files/blobs/…", "avif": …}, "medium": …, "full": …}
+Renditions = dict[str, dict[str, str]]
+
+
+def _rendition_urls(value) -> Renditions | None:
+    """Turn the stored renditions JSON (stored paths) into /files URLs."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not value:
+        return None
+    return {
+        name: {
+            fmt: path if path.startswith("/files/") else f"/files/{path}"
+            for fmt, path in formats.items()
+        }
+        for name, formats in value.items()
+    }
 
 
 # --- Image ---
@@ -10,8 +30,11 @@ class ImageRead(BaseModel):
     stored_path: str
     mime_type: str
     size_bytes: int
+    renditions: Renditions | None = None
     created_at: datetime
 
+    _renditions = field_validator("renditions", mode="before")(_rendition_urls)
+
 
 # --- Target ---
 class TargetCreate(BaseModel):
@@ -83,6 +106,9 @@ class GenerationCreate(BaseModel):
     product_ids: list[int] | None = None
     promotion_prompt: str | None = None
     design_style: str | None = None
+    priority: Literal["interactive", "bulk"] = "interactive"
+    force_refresh: bool = False  # ignore cached analysis / creative brief / adapted copy
+    regenerate: bool = False  # never reuse an earlier identical image
 
 
 class GenerationResultRead(BaseModel):
@@ -94,10 +120,14 @@ class GenerationResultRead(BaseModel):
     prompt_used: str | None = None
     rationale: str | None = None
     adapted_text: str | None = None
+    reused_from_id: int | None = None
+    renditions: Renditions | None = None
     error: str | None = None
     created_at: datetime
     target: TargetRead | None = None
 
+    _renditions = field_validator("renditions", mode="before")(_rendition_urls)
+
 
 class GenerationRead(BaseModel):
     id: int
@@ -107,12 +137,71 @@ class GenerationRead(BaseModel):
     promotion_prompt: str | None = None
     design_style: str | None = None
     mode: str = "derive"
+    priority: str = "interactive"
+    force_refresh: bool = False
+    regenerate: bool = False
+    reused_images: int = 0
+    prompt_similarity: float | None = None
+    similar_generation_id: int | None = None
+    similarity_threshold: float | None = None
+    brief_reused: bool = False
+    campaign_id: int | None = None
+    analysis_leader_id: int | None = None
     status: str
+    queue_position: int | None = None  # estimated place in the job queue while queued
     model: str
     analysis_result: str | None = None
     error: str | None = None
     created_at: datetime
+    started_at: datetime | None = None
     completed_at: datetime | None = None
     results: list[GenerationResultRead] = []
     source_image: ImageRead | None = None
     product: ProductRead | None = None
+
+
+# --- Campaign ---
+class CampaignCreate(BaseModel):
+    name: str | None = None
+    source_image_id: int | None = None
+    promotion_prompt: str | None = None
+    product_sets: list[list[int]] = [[]]  # one cell per set; [] = no product
+    design_styles: list[str | None] = [None]
+    target_ids: list[int]
+    priority: Literal["interactive", "bulk"] = "bulk"
+
+
+class CampaignCell(BaseModel):
+    generation_id: int
+    product_ids: list[int]
+    design_style: str | None = None
+    status: str
+    analysis_leader_id: int | None = None
+    results_completed: int
+    results_total: int
+
+
+class CampaignProgress(BaseModel):
+    cells_total: int
+    cells_finished: int
+    results_total: int
+    results_completed: int
+    results_failed: int
+    results_cancelled: int
+    percent: float
+
+
+class CampaignRead(BaseModel):
+    id: int
+    name: str | None = None
+    source_image_id: int | None = None
+    promotion_prompt: str | None = None
+    design_styles: list[str | None]
+    product_sets: list[list[int]]
+    target_ids: list[int]
+    priority: str
+    status: str  # pending | running | completed | failed | cancelled
+    created_at: datetime
+    completed_at: datetime | None = None
+    progress: CampaignProgress
+    cells: list[CampaignCell] = []
@@ -0,0 +1,381 @@
+"""Offline bulk execution through Gemini batch prediction.
+
+With ``BULK_EXECUTION_MODE=batch``, every Gemini call made by a bulk-priority
+pipeline is parked in a per-model collector instead of being sent online.
+A collector flushes after BATCH_MAX_REQUESTS requests or BATCH_FLUSH_SECONDS,
+writes the requests as a JSONL batch-prediction job, waits for the job and
+hands each response back to the stage that asked for it. The stages do not
+know the difference, so results land in GenerationResult rows as usual.
+
+Backends:
+- ``vertex``: Vertex AI batch prediction; JSONL in/out under BATCH_GCS_URI
+  (needs the google-cloud-storage package).
+- ``local``: a file-based stand-in under BATCH_LOCAL_DIR for development and
+  tests. A job directory holds ``input.jsonl``; if ``output.jsonl`` is not
+  dropped in by hand, placeholder responses are written on the first poll.
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from google.genai import types
+from pydantic import TypeAdapter
+
+from app.config import settings
+from app.services.priority import current_priority
+
+logger = logging.getLogger(__name__)
+
+_stats = {"batches_submitted": 0, "batches_failed": 0, "requests_batched": 0}
+
+
+def use_batch_prediction() -> bool:
+    """Whether Gemini calls made in the current task should go through batches."""
+    return settings.BULK_EXECUTION_MODE == "batch" and current_priority.get() == "bulk"
+
+
+def returns_placeholders() -> bool:
+    """Whether Gemini calls in the current task get the local backend's stand-ins.
+
+    Such outputs must not be cached or reused where online runs would find them.
+    """
+    return use_batch_prediction() and settings.BATCH_BACKEND == "local"
+
+
+def _as_contents(contents: Any) -> list[types.Content]:
+    """The turns of a generate_content call, as the services pass them: one
+    user turn of strings and Parts, or Content objects."""
+    items = contents if isinstance(contents, list) else [contents]
+    if all(isinstance(item, types.Content) for item in items):
+        return items
+    parts = []
+    for item in items:
+        if isinstance(item, str):
+            parts.append(types.Part.from_text(text=item))
+        elif isinstance(item, types.Part):
+            parts.append(item)
+        else:
+            raise TypeError(f"Unsupported content for batch prediction: {type(item).__name__}")
+    return [types.Content(role="user", parts=parts)]
+
+
+def _build_request(
+    key: str,
+    contents: Any,
+    config: types.GenerateContentConfig | None,
+) -> dict:
+    """Serialize one generate_content call as a batch-prediction request line."""
+    request: dict = {
+        "contents": [
+            c.model_dump(mode="json", exclude_none=True, by_alias=True)
+            for c in _as_contents(contents)
+        ],
+        "labels": {"batch_key": key},
+    }
+    if config is not None:
+        schema = config.response_schema
+        if schema is not None and not isinstance(schema, (types.Schema, dict)):
+            # Pydantic response types become a plain JSON schema
+            config = config.model_copy(
+                update={
+                    "response_schema": None,
+                    "response_json_schema": TypeAdapter(schema).json_schema(),
+                }
+            )
+        generation_config = config.model_dump(mode="json", exclude_none=True, by_alias=True)
+        system_instruction = generation_config.pop("systemInstruction", None)
+        if system_instruction is not None:
+            request["systemInstruction"] = (
+                system_instruction
+                if isinstance(system_instruction, dict)
+                else {"parts": [{"text": system_instruction}]}
+            )
+        if generation_config:
+            request["generationConfig"] = generation_config
+    return request
+
+
+def _parse_response(line: dict, config: types.GenerateContentConfig | None):
+    if line.get("status") or "response" not in line:
+        raise RuntimeError(f"Batch prediction failed for request: {line.get('status')}")
+    response = types.GenerateContentResponse.model_validate(line["response"])
+    schema = config.response_schema if config else None
+    if schema is not None and not isinstance(schema, (types.Schema, dict)) and response.text:
+        response.parsed = TypeAdapter(schema).validate_json(response.text)
+    return response
+
+
+class BatchBackend:
+    """Runs JSONL batch-prediction jobs."""
+
+    async def submit(self, model: str, lines: list[dict]) -> str:
+        raise NotImplementedError
+
+    async def poll(self, job: str) -> str:
+        """Return "running", "succeeded" or "failed"."""
+        raise NotImplementedError
+
+    async def results(self, job: str) -> list[dict]:
+        raise NotImplementedError
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based fake batch backend; needs no network or credentials."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    async def submit(self, model: str, lines: list[dict]) -> str:
+        job = f"{model}-{uuid.uuid4().hex[:12]}"
+        job_dir = self.directory / job
+        job_dir.mkdir(parents=True, exist_ok=True)
+        body = "".join(json.dumps({"request": line}) + "\n" for line in lines)
+        await asyncio.to_thread((job_dir / "input.jsonl").write_text, body)
+        return job
+
+    async def poll(self, job: str) -> str:
+        job_dir = self.directory / job
+        output = job_dir / "output.jsonl"
+        if not output.exists():
+            await asyncio.to_thread(self._respond, job_dir)
+        return "succeeded"
+
+    async def results(self, job: str) -> list[dict]:
+        text = await asyncio.to_thread((self.directory / job / "output.jsonl").read_text)
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def _respond(self, job_dir: Path) -> None:
+        lines = []
+        for raw in (job_dir / "input.jsonl").read_text().splitlines():
+            request = json.loads(raw)["request"]
+            lines.append(json.dumps({"request": request, "response": _placeholder(request)}))
+        tmp = job_dir / "output.jsonl.tmp"
+        tmp.write_text("".join(line + "\n" for line in lines))
+        tmp.replace(job_dir / "output.jsonl")
+
+
+def _placeholder(request: dict) -> dict:
+    """Deterministic stand-in response for a request (local backend only)."""
+    config = request.get("generationConfig", {})
+    prompt = " ".join(
+        part.get("text", "") for content in request["contents"] for part in content["parts"]
+    )
+    digest = hashlib.sha256(prompt.encode()).digest()
+    parts: list[dict] = []
+
+    if "IMAGE" in config.get("responseModalities", []):
+        from PIL import Image as PILImage
+
+        buffer = io.BytesIO()
+        PILImage.new("RGB", (64, 36), tuple(digest[:3])).save(buffer, format="PNG")
+        parts.append({"text": "[local batch]"})
+        parts.append(
+            {
+                "inlineData": {
+                    "mimeType": "image/png",
+                    "data": base64.b64encode(buffer.getvalue()).decode(),
+                }
+            }
+        )
+    elif config.get("responseMimeType") == "application/json":
+        schema = config.get("responseJsonSchema") or config.get("responseSchema") or {}
+        is_array = str(schema.get("type", "")).lower() == "array"
+        parts.append({"text": "[]" if is_array else "{}"})
+    elif "JSON" in prompt:
+        # Prompts that ask for a JSON object in plain text (analysis, brief)
+        parts.append({"text": "{}"})
+    else:
+        parts.append({"text": f"[local batch] {prompt[:200]}"})
+
+    return {"candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP"}]}
+
+
+class VertexBatchBackend(BatchBackend):
+    """Vertex AI batch prediction with JSONL files in Cloud Storage."""
+
+    _STATES = {
+        "JOB_STATE_SUCCEEDED": "succeeded",
+        "JOB_STATE_FAILED": "failed",
+        "JOB_STATE_CANCELLED": "failed",
+        "JOB_STATE_EXPIRED": "failed",
+    }
+
+    def __init__(self, gcs_uri: str):
+        if not gcs_uri.startswith("gs://"):
+            raise ValueError("BATCH_GCS_URI must be a gs:// prefix for the vertex batch backend")
+        self.gcs_uri = gcs_uri.rstrip("/")
+
+    def _bucket(self, uri: str):
+        try:
+            from google.cloud import storage
+        except ImportError as e:
+            raise RuntimeError(
+                "The vertex batch backend needs google-cloud-storage "
+                "(pip install google-cloud-storage)"
+            ) from e
+        bucket, _, path = uri.removeprefix("gs://").partition("/")
+        return storage.Client(project=settings.GCP_PROJECT_ID or None).bucket(bucket), path
+
+    async def submit(self, model: str, lines: list[dict]) -> str:
+        from app.services.genai_client import get_client
+
+        prefix = f"{self.gcs_uri}/{model}-{uuid.uuid4().hex[:12]}"
+        body = "".join(json.dumps({"request": line}) + "\n" for line in lines)
+        bucket, path = self._bucket(f"{prefix}/input.jsonl")
+        await asyncio.to_thread(
+            bucket.blob(path).upload_from_string, body, content_type="application/jsonl"
+        )
+        job = await get_client().aio.batches.create(
+            model=model,
+            src=f"{prefix}/input.jsonl",
+            config=types.CreateBatchJobConfig(dest=f"{prefix}/output"),
+        )
+        return job.name
+
+    async def poll(self, job: str) -> str:
+        from app.services.genai_client import get_client
+
+        batch = await get_client().aio.batches.get(name=job)
+        return self._STATES.get(getattr(batch.state, "value", str(batch.state)), "running")
+
+    async def results(self, job: str) -> list[dict]:
+        from app.services.genai_client import get_client
+
+        batch = await get_client().aio.batches.get(name=job)
+        bucket, prefix = self._bucket(batch.dest.gcs_uri)
+
+        def read() -> list[dict]:
+            lines = []
+            for blob in bucket.client.list_blobs(bucket, prefix=prefix):
+                if blob.name.endswith(".jsonl"):
+                    text = blob.download_as_text()
+                    lines += [json.loads(line) for line in text.splitlines() if line.strip()]
+            return lines
+
+        return await asyncio.to_thread(read)
+
+
+@dataclass
+class _Pending:
+    key: str
+    request: dict
+    future: asyncio.Future
+
+
+class BatchCollector:
+    """Accumulates one model's requests and runs them as batch jobs."""
+
+    def __init__(self, model: str, backend: BatchBackend):
+        self.model = model
+        self.backend = backend
+        self._pending: list[_Pending] = []
+        self._timer: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, request: dict, key: str) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_Pending(key, request, future))
+        if len(self._pending) >= settings.BATCH_MAX_REQUESTS:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.BATCH_FLUSH_SECONDS)
+        self._timer = None
+        self._flush()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items = [item for item in self._pending if not item.future.done()]
+        self._pending = []
+        if items:
+            task = asyncio.create_task(self._run(items))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, items: list[_Pending]) -> None:
+        try:
+            job = await self.backend.submit(self.model, [item.request for item in items])
+            _stats["batches_submitted"] += 1
+            _stats["requests_batched"] += len(items)
+            logger.info(f"Submitted batch job {job} with {len(items)} {self.model} requests")
+
+            while (state := await self.backend.poll(job)) == "running":
+                await asyncio.sleep(settings.BATCH_POLL_SECONDS)
+            if state != "succeeded":
+                raise RuntimeError(f"Batch job {job} {state}")
+
+            by_key = {}
+            for line in await self.backend.results(job):
+                key = (line.get("request") or {}).get("labels", {}).get("batch_key")
+                if key:
+                    by_key[key] = line
+            for item in items:
+                if item.future.done():
+                    continue
+                line = by_key.get(item.key)
+                if line is None:
+                    item.future.set_exception(
+                        RuntimeError(f"No output for request in batch job {job}")
+                    )
+                else:
+                    item.future.set_result(line)
+        except Exception as e:
+            _stats["batches_failed"] += 1
+            logger.error(f"Batch prediction for {self.model} failed: {e}")
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+_backend: BatchBackend | None = None
+_collectors: dict[str, BatchCollector] = {}
+
+
+def get_batch_backend() -> BatchBackend:
+    global _backend
+    if _backend is None:
+        if settings.BATCH_BACKEND == "local":
+            _backend = LocalBatchBackend(settings.BATCH_LOCAL_DIR)
+        elif settings.BATCH_BACKEND == "vertex":
+            _backend = VertexBatchBackend(settings.BATCH_GCS_URI)
+        else:
+            raise ValueError(f"Unknown BATCH_BACKEND: {settings.BATCH_BACKEND}")
+    return _backend
+
+
+async def batch_generate_content(
+    model: str,
+    contents: Any,
+    config: types.GenerateContentConfig | None = None,
+) -> types.GenerateContentResponse:
+    """Run one generate_content call as part of the model's next batch job."""
+    collector = _collectors.get(model)
+    if collector is None:
+        collector = _collectors[model] = BatchCollector(model, get_batch_backend())
+    key = uuid.uuid4().hex
+    line = await collector.submit(_build_request(key, contents, config), key)
+    return _parse_response(line, config)
+
+
+def batch_stats() -> dict:
+    return {
+        **_stats,
+        "mode": settings.BULK_EXECUTION_MODE,
+        "backend": settings.BATCH_BACKEND,
+        "pending": {model: c.pending() for model, c in _collectors.items()},
+    }
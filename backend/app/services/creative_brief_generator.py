@@ -1,10 +1,17 @@
+import asyncio
 import json
 
-from PIL import Image as PILImage
-
-from google import genai
-
 from app.config import settings
+from app.services.genai_client import generate_content
+from app.services.prompt_similarity import PromptMatch, find_similar, remember
+from app.services.reference_images import PreparedImage
+from app.services.result_cache import (
+    cache_get,
+    cache_key,
+    cache_put,
+    normalize_text,
+    prompt_version,
+)
 
 BRIEF_PROMPT = """You are a creative director for Korean beauty advertising.
 Based on the following inputs, generate a detailed creative brief for a promotional image.
@@ -26,21 +33,52 @@ Return a JSON object with these fields (matching the structure of an image analy
 
 Return ONLY valid JSON, no markdown formatting or code blocks."""
 
+BRIEF_CACHE_VERSION = prompt_version(BRIEF_PROMPT)
+
+
+def _brief_cache_keys(
+    promotion_prompt: str | None,
+    product_lines: list[str],
+    style_desc: str | None,
+    product_images: list[PreparedImage] | None,
+) -> tuple[str, str]:
+    """Return (context key, brief key); the context covers everything but the prompt."""
+    context_key = cache_key(
+        BRIEF_CACHE_VERSION,
+        product_lines,
+        style_desc,
+        [img.digest for img in product_images or []],
+    )
+    return context_key, cache_key(context_key, normalize_text(promotion_prompt))
+
 
 async def generate_creative_brief(
     promotion_prompt: str | None = None,
     product_context: dict | None = None,
     design_style: str | None = None,
-    product_image_paths: list[str] | None = None,
-) -> str:
-    """Generate a creative brief JSON matching image_analyzer output structure."""
+    product_images: list[PreparedImage] | None = None,
+    force_refresh: bool = False,
+    generation_id: int | None = None,
+) -> tuple[str, PromptMatch | None]:
+    """Generate a creative brief JSON matching image_analyzer output structure.
+
+    Briefs are cached on a hash of the normalized promotion prompt, the
+    product lines, the style directive, the product image bytes and the
+    prompt version, so reruns that only change the targets reuse them.
+
+    On a cache miss the prompt is compared with earlier prompts of the same
+    inputs (PROMPT_SIMILARITY_MODE). Returns the brief and the closest
+    earlier prompt, if any; with "reuse" mode a match at or above
+    PROMPT_SIMILARITY_THRESHOLD supplies the brief.
+    """
     input_parts = []
+    product_lines = []
+    style_desc = None
 
     if promotion_prompt:
         input_parts.append(f"Promotion description: {promotion_prompt}")
 
     if product_context:
-        product_lines = []
         if product_context.get("name"):
             product_lines.append(f"Product name: {product_context['name']}")
         if product_context.get("brand"):
@@ -62,23 +100,38 @@ async def generate_creative_brief(
         if style_desc:
             input_parts.append(f"Design style direction: {style_desc}")
 
+    context_key, key = _brief_cache_keys(promotion_prompt, product_lines, style_desc, product_images)
+    if not force_refresh:
+        cached = await asyncio.to_thread(cache_get, "brief", key)
+        if cached is not None:
+            return cached, None
+
+    match = None
+    track_similarity = settings.PROMPT_SIMILARITY_MODE != "off" and bool(promotion_prompt)
+    if track_similarity:
+        match = await asyncio.to_thread(find_similar, context_key, promotion_prompt)
+        if (
+            match
+            and not force_refresh
+            and settings.PROMPT_SIMILARITY_MODE == "reuse"
+            and match.score >= settings.PROMPT_SIMILARITY_THRESHOLD
+        ):
+            cached = await asyncio.to_thread(cache_get, "brief", match.brief_key)
+            if cached is not None:
+                match.reused = True
+                return cached, match
+
     inputs = "\n\n".join(input_parts) if input_parts else "Create a generic beauty product promotional image."
 
     prompt = BRIEF_PROMPT.format(inputs=inputs)
 
-    client = genai.Client(
-        vertexai=True,
-        project=settings.GCP_PROJECT_ID,
-        location=settings.GCP_LOCATION,
-    )
-
     contents: list = []
-    if product_image_paths:
-        for path in product_image_paths:
-            contents.append(PILImage.open(path))
+    if product_images:
+        for img in product_images:
+            contents.append(img.as_part())
     contents.append(prompt)
 
-    response = client.models.generate_content(
+    response = await generate_content(
         model="gemini-3.1-pro-preview",
         contents=contents,
     )
@@ -94,4 +147,7 @@ async def generate_creative_brief(
     # Validate it's valid JSON
     json.loads(raw)
 
-    return raw
+    await asyncio.to_thread(cache_put, "brief", key, raw)
+    if track_similarity and not (match and match.brief_key == key):
+        await asyncio.to_thread(remember, context_key, promotion_prompt, key, generation_id)
+    return raw, match
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from typing import Any
+
+import httpx
+from google import genai
+from google.genai import types
+
+from app.config import settings
+from app.services.batch_prediction import batch_generate_content, use_batch_prediction
+from app.services.rate_limiter import call_with_rate_limit
+
+logger = logging.getLogger(__name__)
+
+# One client per (project, location), shared by every request in the process.
+# Each client keeps its own pooled httpx.AsyncClient, so connections to Vertex AI
+# stay alive between calls instead of being re-established per service call.
+_clients: dict[tuple[str, str], genai.Client] = {}
+
+_stats = {
+    "clients_created": 0,
+    "client_reuses": 0,
+    "http_requests": 0,
+    "connections_opened": 0,
+}
+
+
+async def _trace(event_name: str, info: dict) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        _stats["connections_opened"] += 1
+
+
+async def _on_request(request: httpx.Request) -> None:
+    _stats["http_requests"] += 1
+    request.extensions["trace"] = _trace
+
+
+def _create_client(project: str, location: str) -> genai.Client:
+    http_options = types.HttpOptions(
+        async_client_args={
+            "limits": httpx.Limits(
+                max_connections=settings.GENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GENAI_MAX_CONNECTIONS,
+                keepalive_expiry=settings.GENAI_KEEPALIVE_SECONDS,
+            ),
+            "event_hooks": {"request": [_on_request]},
+        },
+    )
+    logger.info(f"Creating genai client for project={project!r} location={location!r}")
+    return genai.Client(
+        vertexai=True,
+        project=project,
+        location=location,
+        http_options=http_options,
+    )
+
+
+def get_client(location: str | None = None) -> genai.Client:
+    """Return the shared client for the configured project and given location."""
+    key = (settings.GCP_PROJECT_ID, location or settings.GCP_LOCATION)
+    client = _clients.get(key)
+    if client is None:
+        client = _create_client(*key)
+        _clients[key] = client
+        _stats["clients_created"] += 1
+    else:
+        _stats["client_reuses"] += 1
+    return client
+
+
+def init_clients() -> None:
+    """Create the clients used by the services up front (called at startup)."""
+    for location in {settings.GCP_LOCATION, "global"}:
+        key = (settings.GCP_PROJECT_ID, location)
+        if key in _clients:
+            continue
+        try:
+            _clients[key] = _create_client(*key)
+            _stats["clients_created"] += 1
+        except Exception as e:
+            # Missing credentials should not keep the API from starting;
+            # get_client() will retry (and surface the error) on first use.
+            logger.warning(f"Could not create genai client for {key}: {e}")
+
+
+async def close_clients() -> None:
+    """Close every pooled client (called at shutdown)."""
+    for key, client in list(_clients.items()):
+        try:
+            await client.aio.aclose()
+            client.close()
+        except Exception as e:
+            logger.warning(f"Failed to close genai client {key}: {e}")
+    _clients.clear()
+
+
+async def generate_content(
+    model: str,
+    contents: Any,
+    config: types.GenerateContentConfig | None = None,
+    location: str | None = None,
+) -> types.GenerateContentResponse:
+    """Call Gemini through the shared client and the model's rate limiter.
+
+    Each attempt is bounded by GEMINI_CALL_TIMEOUT; a timed-out attempt
+    raises TimeoutError and is not retried. Bulk work in batch mode is
+    handed to the batch-prediction collector instead and uses no online quota.
+    """
+    if use_batch_prediction():
+        return await batch_generate_content(model, contents, config)
+
+    client = get_client(location)
+    return await call_with_rate_limit(
+        model,
+        lambda: asyncio.wait_for(
+            client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config,
+            ),
+            timeout=settings.GEMINI_CALL_TIMEOUT,
+        ),
+    )
+
+
+def client_stats() -> dict:
+    """Counters showing how often clients and HTTP connections are reused."""
+    stats = dict(_stats)
+    stats["active_clients"] = len(_clients)
+    stats["connections_reused"] = max(
+        0, stats["http_requests"] - stats["connections_opened"]
+    )
+    return stats
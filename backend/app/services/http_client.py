@@ -0,0 +1,42 @@
+import logging
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# One pooled client for outbound fetches (product pages and images), so
+# repeated downloads from the same shop reuse keep-alive connections.
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=settings.HTTP_TIMEOUT_SECONDS,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the pooled client (called at shutdown)."""
+    global _client
+    if _client is not None:
+        try:
+            await _client.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close HTTP client: {e}")
+        _client = None
@@ -1,10 +1,9 @@
+import asyncio
 import json
 
-from PIL import Image as PILImage
-
-from google import genai
-
-from app.config import settings
+from app.services.genai_client import generate_content
+from app.services.reference_images import PreparedImage
+from app.services.result_cache import cache_get, cache_key, cache_put, prompt_version
 
 ANALYSIS_PROMPT = """Analyze this beauty/cosmetic product promotional image in detail.
 Return a JSON object with these fields:
@@ -45,54 +44,89 @@ Using both the promotional image and the product reference image, return a JSON
 Return ONLY valid JSON, no markdown formatting or code blocks."""
 
 
+ANALYSIS_CACHE_VERSION = prompt_version(ANALYSIS_PROMPT, ANALYSIS_WITH_PRODUCT_PROMPT)
+
+
+def _product_info(product_metadata: dict | None) -> str:
+    product_info_parts = []
+    if product_metadata:
+        if product_metadata.get("name"):
+            product_info_parts.append(f"Product name: {product_metadata['name']}")
+        if product_metadata.get("brand"):
+            product_info_parts.append(f"Brand: {product_metadata['brand']}")
+        if product_metadata.get("category"):
+            product_info_parts.append(f"Category: {product_metadata['category']}")
+        if product_metadata.get("description"):
+            product_info_parts.append(f"Description: {product_metadata['description']}")
+        if product_metadata.get("key_features"):
+            features = product_metadata["key_features"]
+            if isinstance(features, list):
+                product_info_parts.append(f"Key features: {', '.join(features)}")
+
+    return "\n".join(product_info_parts) if product_info_parts else "No metadata provided"
+
+
+def _analysis_cache_key(
+    image: PreparedImage,
+    product_images: list[PreparedImage] | None,
+    product_info: str | None,
+) -> str:
+    return cache_key(
+        ANALYSIS_CACHE_VERSION,
+        image.digest,
+        [img.digest for img in product_images or []],
+        product_info,
+    )
+
+
 async def analyze_image(
-    image_path: str,
-    product_image_paths: list[str] | None = None,
+    image: PreparedImage,
+    product_images: list[PreparedImage] | None = None,
     product_metadata: dict | None = None,
+    force_refresh: bool = False,
 ) -> str:
-    client = genai.Client(
-        vertexai=True,
-        project=settings.GCP_PROJECT_ID,
-        location=settings.GCP_LOCATION,
-    )
+    """Analyze a promotional image, optionally with product context.
+
+    The output depends only on the image bytes, product image bytes, product
+    metadata and the prompt, so it is cached on a hash of those. Pass
+    ``force_refresh`` to skip the cached entry (the fresh result replaces it).
+    """
+    with_product = bool(product_images or product_metadata)
+    product_info = _product_info(product_metadata) if with_product else None
+
+    key = _analysis_cache_key(image, product_images, product_info)
+    if not force_refresh:
+        cached = await asyncio.to_thread(cache_get, "analysis", key)
+        if cached is not None:
+            return cached
 
-    promo_img = PILImage.open(image_path)
+    promo_img = image.as_part()
 
-    if product_image_paths or product_metadata:
+    if with_product:
         # Enhanced analysis with product context
-        product_info_parts = []
-        if product_metadata:
-            if product_metadata.get("name"):
-                product_info_parts.append(f"Product name: {product_metadata['name']}")
-            if product_metadata.get("brand"):
-                product_info_parts.append(f"Brand: {product_metadata['brand']}")
-            if product_metadata.get("category"):
-                product_info_parts.append(f"Category: {product_metadata['category']}")
-            if product_metadata.get("description"):
-                product_info_parts.append(f"Description: {product_metadata['description']}")
-            if product_metadata.get("key_features"):
-                features = product_metadata["key_features"]
-                if isinstance(features, list):
-                    product_info_parts.append(f"Key features: {', '.join(features)}")
-
-        product_info = "\n".join(product_info_parts) if product_info_parts else "No metadata provided"
         prompt = ANALYSIS_WITH_PRODUCT_PROMPT.format(product_info=product_info)
 
         contents = [promo_img]
-        if product_image_paths:
-            for path in product_image_paths:
-                contents.append(PILImage.open(path))
+        if product_images:
+            for img in product_images:
+                contents.append(img.as_part())
         contents.append(prompt)
 
-        response = client.models.generate_content(
+        response = await generate_content(
             model="gemini-3.1-pro-preview",
             contents=contents,
         )
     else:
         # Basic analysis with promotional image only
-        response = client.models.generate_content(
+        response = await generate_content(
             model="gemini-3.1-pro-preview",
             contents=[promo_img, ANALYSIS_PROMPT],
         )
 
+    # A malformed answer is still usable once, but must not be served from cache
+    try:
+        json.loads(response.text or "")
+    except json.JSONDecodeError:
+        return response.text
+    await asyncio.to_thread(cache_put, "analysis", key, response.text)
     return response.text
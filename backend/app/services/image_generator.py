@@ -1,21 +1,38 @@
 import asyncio
 import logging
 
-from google import genai
 from google.genai import types
 
-from app.config import settings
+from app.services.genai_client import generate_content
+from app.services.reference_images import PreparedImage
+from app.services.result_cache import cache_key
 from app.services.storage import save_bytes
 
 logger = logging.getLogger(__name__)
 
-MAX_RETRIES = 5
-INITIAL_WAIT = 30  # seconds
+IMAGE_MODEL = "gemini-3.1-flash-image-preview"
+IMAGE_ASPECT_RATIO = "16:9"
+IMAGE_SIZE = "2K"
+
+
+def image_key(prompt: str, reference_images: list[PreparedImage] | None = None) -> str:
+    """Digest of everything that determines a generated image.
+
+    Reference images count by the bytes sent, so changing how they are
+    prepared (size, format, quality) stops earlier images from being reused.
+    """
+    return cache_key(
+        prompt,
+        [img.payload_digest for img in reference_images or []],
+        IMAGE_MODEL,
+        IMAGE_ASPECT_RATIO,
+        IMAGE_SIZE,
+    )
 
 
 async def generate_image(
     prompt: str,
-    reference_images: list[str] | None = None,
+    reference_images: list[PreparedImage] | None = None,
 ) -> str | None:
     """Generate an image using Nano Banana 2 (Gemini 3.1 Flash Image).
 
@@ -25,55 +42,36 @@ async def generate_image(
     - Supports readable text rendering in images
     - Up to 4K resolution, flexible aspect ratios
     """
-    from PIL import Image as PILImage
-
-    client = genai.Client(
-        vertexai=True,
-        project=settings.GCP_PROJECT_ID,
-        location="global",
-    )
-
     contents: list = []
     if reference_images:
-        for img_path in reference_images:
-            contents.append(PILImage.open(img_path))
+        for img in reference_images:
+            contents.append(img.as_part())
     contents.append(prompt)
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.models.generate_content(
-                model="gemini-3.1-flash-image-preview",
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    response_modalities=["TEXT", "IMAGE"],
-                    image_config=types.ImageConfig(
-                        aspect_ratio="16:9",
-                        image_size="2K",
-                    ),
-                ),
-            )
-
-            if not response.candidates:
-                return None
-
-            # Extract image from response parts
-            for part in response.candidates[0].content.parts:
-                if part.inline_data and part.inline_data.data:
-                    image_bytes = part.inline_data.data
-                    stored_path = save_bytes(
-                        image_bytes, "generated.png", subdir="generated"
-                    )
-                    return stored_path
+    # Rate limiting and 429 retries are handled by the shared per-model limiter
+    response = await generate_content(
+        model=IMAGE_MODEL,
+        contents=contents,
+        config=types.GenerateContentConfig(
+            response_modalities=["TEXT", "IMAGE"],
+            image_config=types.ImageConfig(
+                aspect_ratio=IMAGE_ASPECT_RATIO,
+                image_size=IMAGE_SIZE,
+            ),
+        ),
+        location="global",
+    )
 
-            return None
+    if not response.candidates:
+        return None
 
-        except Exception as e:
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                wait = INITIAL_WAIT * (attempt + 1)
-                logger.warning(f"Rate limited, waiting {wait}s (attempt {attempt + 1}/{MAX_RETRIES})")
-                await asyncio.sleep(wait)
-            else:
-                logger.error(f"Image generation failed (non-rate-limit): {e}")
-                raise
+    # Extract image from response parts
+    for part in response.candidates[0].content.parts:
+        if part.inline_data and part.inline_data.data:
+            image_bytes = part.inline_data.data
+            stored_path = await asyncio.to_thread(
+                save_bytes, image_bytes, "generated.png"
+            )
+            return stored_path
 
-    raise Exception("Max retries exceeded for image generation")
+    return None
@@ -0,0 +1,244 @@
+import json
+import math
+import logging
+from collections.abc import Collection
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, col, func, or_, select, update
+
+from app.config import settings
+from app.database import engine
+from app.models.db import Job
+from app.services.priority import StridePicker, priority_weight
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Interface for the persistent queue that feeds worker processes.
+
+    A worker claims a job, which gives it a lease until ``lease_expires_at``.
+    It must heartbeat before the lease runs out; a job whose lease expired
+    (the worker crashed or was killed) becomes claimable again. Jobs carry
+    a priority class; claims share out between classes by PRIORITY_WEIGHTS.
+    """
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        generation_id: int | None = None,
+        priority: str = settings.DEFAULT_PRIORITY,
+    ) -> int:
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, priorities: Collection[str] | None = None) -> Job | None:
+        """Lease the next job, limited to the ``priorities`` classes if given."""
+        raise NotImplementedError
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        raise NotImplementedError
+
+    def complete(self, job_id: int, worker_id: str) -> None:
+        raise NotImplementedError
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> None:
+        raise NotImplementedError
+
+    def cancel(self, job_id: int, worker_id: str) -> None:
+        raise NotImplementedError
+
+    def cancel_queued(self, generation_id: int) -> int:
+        raise NotImplementedError
+
+    def queue_position(self, generation_id: int) -> int | None:
+        raise NotImplementedError
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue stored in the ``job`` table of the application database."""
+
+    def __init__(self):
+        self._picker = StridePicker()
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        generation_id: int | None = None,
+        priority: str = settings.DEFAULT_PRIORITY,
+    ) -> int:
+        with Session(engine) as session:
+            job = Job(
+                kind=kind,
+                payload=json.dumps(payload),
+                generation_id=generation_id,
+                priority=priority,
+            )
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            logger.info(f"Enqueued {kind} job {job.id} ({priority})")
+            return job.id
+
+    def claim(self, worker_id: str, priorities: Collection[str] | None = None) -> Job | None:
+        with Session(engine) as session:
+            while True:
+                now = datetime.utcnow()
+                claimable = or_(
+                    Job.status == "queued",
+                    (Job.status == "running") & (col(Job.lease_expires_at) < now),
+                )
+                if priorities is not None:
+                    claimable = claimable & col(Job.priority).in_(priorities)
+                classes = set(session.exec(select(Job.priority).where(claimable).distinct()).all())
+                if not classes:
+                    return None
+
+                candidate = session.exec(
+                    select(Job)
+                    .where(claimable, Job.priority == self._picker.pick(classes))
+                    .order_by(Job.id)
+                    .limit(1)
+                ).first()
+                if candidate is None:
+                    continue
+
+                if candidate.status == "running" and candidate.attempts >= settings.JOB_MAX_ATTEMPTS:
+                    candidate.status = "failed"
+                    candidate.error = "Lease expired too many times"
+                    candidate.finished_at = now
+                    session.add(candidate)
+                    session.commit()
+                    continue
+
+                if candidate.generation_id is not None and session.exec(
+                    select(Job.id).where(
+                        Job.generation_id == candidate.generation_id,
+                        Job.id != candidate.id,
+                        Job.status == "running",
+                        col(Job.lease_expires_at) >= now,
+                    )
+                ).first():
+                    # Another live worker already owns this generation
+                    candidate.status = "superseded"
+                    candidate.finished_at = now
+                    session.add(candidate)
+                    session.commit()
+                    continue
+
+                # Optimistic claim: only succeeds if nobody else took it first
+                claimed = session.exec(
+                    update(Job)
+                    .where(
+                        Job.id == candidate.id,
+                        Job.status == candidate.status,
+                        Job.attempts == candidate.attempts,
+                    )
+                    .values(
+                        status="running",
+                        worker_id=worker_id,
+                        attempts=candidate.attempts + 1,
+                        lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                        heartbeat_at=now,
+                        started_at=now,
+                    )
+                )
+                session.commit()
+                if claimed.rowcount == 1:
+                    session.refresh(candidate)
+                    return candidate
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            updated = session.exec(
+                update(Job)
+                .where(Job.id == job_id, Job.worker_id == worker_id, Job.status == "running")
+                .values(
+                    heartbeat_at=now,
+                    lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                )
+            )
+            session.commit()
+            return updated.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str) -> None:
+        self._finish(job_id, worker_id, "completed", None)
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> None:
+        self._finish(job_id, worker_id, "failed", error)
+
+    def cancel(self, job_id: int, worker_id: str) -> None:
+        self._finish(job_id, worker_id, "cancelled", None)
+
+    def cancel_queued(self, generation_id: int) -> int:
+        with Session(engine) as session:
+            cancelled = session.exec(
+                update(Job)
+                .where(Job.generation_id == generation_id, Job.status == "queued")
+                .values(status="cancelled", finished_at=datetime.utcnow())
+            )
+            session.commit()
+            return cancelled.rowcount
+
+    def queue_position(self, generation_id: int) -> int | None:
+        """Estimated 1-based place of the generation's queued job, or None.
+
+        Counts the same-class jobs queued ahead of it, plus the share of
+        other classes' queued jobs that weighted claiming will interleave
+        before it.
+        """
+        with Session(engine) as session:
+            job = session.exec(
+                select(Job)
+                .where(Job.generation_id == generation_id, Job.status == "queued")
+                .order_by(Job.id)
+                .limit(1)
+            ).first()
+            if job is None:
+                return None
+
+            queued = session.exec(
+                select(Job.priority, func.count())
+                .where(
+                    Job.status == "queued",
+                    or_(Job.priority != job.priority, Job.id < job.id),
+                )
+                .group_by(Job.priority)
+            ).all()
+            counts = dict(queued)
+            ahead = counts.pop(job.priority, 0)
+            weight = priority_weight(job.priority)
+            interleaved = 0
+            for cls, count in counts.items():
+                # Turns the other class gets before ours under stride scheduling;
+                # on a tie the heavier class goes first
+                share = ahead / weight * priority_weight(cls)
+                turns = math.ceil(share)
+                if share == turns and priority_weight(cls) > weight:
+                    turns += 1
+                interleaved += min(count, turns)
+            return ahead + interleaved + 1
+
+    def _finish(self, job_id: int, worker_id: str, status: str, error: str | None) -> None:
+        with Session(engine) as session:
+            session.exec(
+                update(Job)
+                .where(Job.id == job_id, Job.worker_id == worker_id)
+                .values(status=status, error=error, finished_at=datetime.utcnow())
+            )
+            session.commit()
+
+
+_queue: JobQueue | None = None
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        if settings.JOB_QUEUE_BACKEND == "sqlite":
+            _queue = SQLiteJobQueue()
+        else:
+            raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {settings.JOB_QUEUE_BACKEND}")
+    return _queue
@@ -0,0 +1,199 @@
+"""Where stored files live: the object storage behind services/storage.py.
+
+Keys are the ``stored_path`` strings (``blobs/ab/<sha256>.png``). UPLOAD_DIR
+always holds a local copy of the files a host has written or read, since
+PIL, the process pool and the model payloads work on local files; with a
+remote backend it is a read-through cache that any host may prune, because
+blobs never change.
+
+Backends (STORAGE_BACKEND):
+- ``local``: UPLOAD_DIR itself is the store, so a single host is assumed;
+  /files serves the files directly.
+- ``s3``: an S3-compatible bucket (AWS S3, MinIO, R2, ...) under
+  S3_BUCKET / S3_PREFIX, shared by every API and worker host (needs the
+  boto3 package; credentials come from the usual AWS environment). /files
+  redirects to presigned URLs, so the API never proxies image bytes.
+- ``memory``: an in-process stand-in for a remote bucket, for development
+  and tests; needs no network or credentials.
+"""
+import shutil
+import threading
+from pathlib import Path
+
+from app.config import settings
+
+
+class StorageBackend:
+    """Stores files by key. Transfers stream from and to local files."""
+
+    remote = True  # False when the backend's files are the local copies themselves
+
+    def put_file(self, key: str, path: Path, content_type: str | None = None) -> None:
+        raise NotImplementedError
+
+    def get_file(self, key: str, path: Path) -> bool:
+        """Write the object to ``path``; False if there is no such object."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, expires_in: int) -> str | None:
+        """Time-limited download URL, or None if files are served by the API."""
+        return None
+
+
+class LocalBackend(StorageBackend):
+    """Files under a directory on this host."""
+
+    remote = False
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def put_file(self, key: str, path: Path, content_type: str | None = None) -> None:
+        dest = self._path(key)
+        if dest.resolve() != Path(path).resolve():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(path, dest)
+
+    def get_file(self, key: str, path: Path) -> bool:
+        source = self._path(key)
+        if not source.exists():
+            return False
+        if source.resolve() != Path(path).resolve():
+            shutil.copyfile(source, path)
+        return True
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+
+class MemoryBackend(StorageBackend):
+    """In-process fake of a remote bucket."""
+
+    def __init__(self):
+        self.objects: dict[str, tuple[bytes, str | None]] = {}
+        self._lock = threading.Lock()
+
+    def put_file(self, key: str, path: Path, content_type: str | None = None) -> None:
+        data = Path(path).read_bytes()
+        with self._lock:
+            self.objects[key] = (data, content_type)
+
+    def get_file(self, key: str, path: Path) -> bool:
+        with self._lock:
+            entry = self.objects.get(key)
+        if entry is None:
+            return False
+        Path(path).write_bytes(entry[0])
+        return True
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return key in self.objects
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self.objects.pop(key, None)
+
+
+class S3Backend(StorageBackend):
+    """An S3-compatible bucket, optionally under a key prefix."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = "", region: str = ""):
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set for the s3 storage backend")
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError as e:
+            raise RuntimeError("The s3 storage backend needs boto3 (pip install boto3)") from e
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            config=Config(
+                signature_version="s3v4",
+                max_pool_connections=settings.HTTP_MAX_CONNECTIONS,
+                retries={"mode": "standard"},
+            ),
+        )
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _is_missing(self, error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def put_file(self, key: str, path: Path, content_type: str | None = None) -> None:
+        extra = {}
+        if content_type:
+            extra["ContentType"] = content_type
+        if key.startswith("blobs/"):
+            extra["CacheControl"] = f"public, max-age={settings.FILES_MAX_AGE_SECONDS}, immutable"
+        # upload_file streams the file, in parallel parts when it is large
+        self.client.upload_file(str(path), self.bucket, self._key(key), ExtraArgs=extra)
+
+    def get_file(self, key: str, path: Path) -> bool:
+        try:
+            self.client.download_file(self.bucket, self._key(key), str(path))
+        except Exception as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def presigned_url(self, key: str, expires_in: int) -> str | None:
+        # Signed locally, no request to the bucket
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(key)},
+            ExpiresIn=expires_in,
+        )
+
+
+_backend: StorageBackend | None = None
+
+
+def get_storage_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        if settings.STORAGE_BACKEND == "local":
+            _backend = LocalBackend(settings.UPLOAD_DIR)
+        elif settings.STORAGE_BACKEND == "s3":
+            _backend = S3Backend(
+                settings.S3_BUCKET,
+                prefix=settings.S3_PREFIX,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                region=settings.S3_REGION,
+            )
+        elif settings.STORAGE_BACKEND == "memory":
+            _backend = MemoryBackend()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return _backend
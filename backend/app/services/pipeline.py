@@ -0,0 +1,740 @@
+import asyncio
+import json
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, col, select, update
+
+from app.config import settings
+from app.database import engine
+from app.models.db import Generation, GenerationResult, Image, Job, Product, Target
+from app.services.creative_brief_generator import generate_creative_brief
+from app.services.image_analyzer import analyze_image
+from app.services.image_generator import generate_image, image_key
+from app.services.job_queue import get_job_queue
+from app.services.batch_prediction import returns_placeholders, use_batch_prediction
+from app.services.priority import current_priority
+from app.services.product_images import resolve_product_image
+from app.services.prompt_builder import DESIGN_STYLE_DIRECTIVES, build_prompt
+from app.services.text_adapter import adapt_text, adapt_text_batch
+from app.services.renditions import rendition_paths, schedule_renditions
+from app.services.reference_images import PreparedImage, prepare_image, prepare_images
+from app.services.rationale_generator import generate_rationale, generate_rationales_batch
+from app.services.scheduler import StageGraph
+from app.services.storage import file_exists, local_path, release_blob, retain_blob
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+IN_FLIGHT_STATUSES = ("pending", "analyzing", "generating")
+
+
+def _build_product_context(product: Product) -> dict:
+    """Extract product metadata as a dict for prompt enrichment."""
+    ctx = {"name": product.name}
+    if product.brand:
+        ctx["brand"] = product.brand
+    if product.category:
+        ctx["category"] = product.category
+    if product.description:
+        ctx["description"] = product.description
+    if product.key_features:
+        try:
+            ctx["key_features"] = json.loads(product.key_features)
+        except (json.JSONDecodeError, TypeError):
+            ctx["key_features"] = product.key_features
+    if product.image_url:
+        ctx["image_url"] = product.image_url
+    return ctx
+
+
+def _build_multi_product_context(products: list[Product]) -> dict:
+    """Merge multiple product metadata into a single context dict."""
+    if len(products) == 1:
+        return _build_product_context(products[0])
+
+    names = []
+    brands = []
+    categories = []
+    descriptions = []
+    all_features = []
+    image_urls = []
+
+    for p in products:
+        names.append(p.name)
+        if p.brand:
+            brands.append(p.brand)
+        if p.category:
+            categories.append(p.category)
+        if p.description:
+            descriptions.append(p.description)
+        if p.key_features:
+            try:
+                feats = json.loads(p.key_features)
+                if isinstance(feats, list):
+                    all_features.extend(feats)
+            except (json.JSONDecodeError, TypeError):
+                all_features.append(p.key_features)
+        if p.image_url:
+            image_urls.append(p.image_url)
+
+    ctx: dict = {"name": " + ".join(names)}
+    if brands:
+        ctx["brand"] = ", ".join(set(brands))
+    if categories:
+        ctx["category"] = ", ".join(set(categories))
+    if descriptions:
+        ctx["description"] = " | ".join(descriptions)
+    if all_features:
+        ctx["key_features"] = all_features
+    if image_urls:
+        ctx["image_urls"] = image_urls
+        ctx["image_url"] = image_urls[0]
+    return ctx
+
+
+@dataclass
+class _RunContext:
+    """State shared by the stages of one generation run."""
+
+    generation_id: int
+    design_style: str | None = None
+    product_context: dict | None = None
+    # Product photos, decoded and downsized once for every stage and retry
+    reference_images: list[PreparedImage] = field(default_factory=list)
+    analysis_json: str | None = None
+    text_content: str | None = None
+    force_refresh: bool = False
+    regenerate: bool = False
+
+
+def _load_result(session: Session, result_id: int) -> tuple[GenerationResult, Target]:
+    result = session.get(GenerationResult, result_id)
+    if not result:
+        raise ValueError(f"Result {result_id} not found")
+    target = session.get(Target, result.target_id)
+    if not target:
+        raise ValueError(f"Target {result.target_id} not found")
+    return result, target
+
+
+class _Stopped(Exception):
+    """The row a stage was about to update reached a final status meanwhile."""
+
+
+def _update_unfinished(model, row_id: int, **values) -> bool:
+    """Write ``values`` to a Generation or GenerationResult row unless it is final.
+
+    Stages load rows, await a model and write back; a cancel landing during
+    the await must not be overwritten, so status writes go through here
+    instead of committing the object loaded before the call.
+    """
+    with Session(engine) as session:
+        updated = session.exec(
+            update(model)
+            .where(model.id == row_id, model.status.not_in(FINAL_STATUSES))
+            .values(**values)
+        ).rowcount
+        session.commit()
+    return updated > 0
+
+
+def _fail_result(result_id: int, error: Exception) -> None:
+    with Session(engine) as session:
+        result = session.get(GenerationResult, result_id)
+        if result and result.status not in FINAL_STATUSES:
+            result.status = "failed"
+            result.error = str(error)
+            session.add(result)
+            session.commit()
+    logger.error(f"Pipeline failed for result {result_id}: {error}")
+
+
+def _target_stage(result_id: int, stage: Callable[[], Awaitable[None]]):
+    """Wrap a per-target stage so a failure marks the result failed."""
+
+    async def run() -> None:
+        try:
+            await stage()
+        except _Stopped:
+            raise
+        except Exception as e:
+            _fail_result(result_id, e)
+            raise
+
+    return run
+
+
+# Stages never keep a session open across a model call: a connection held
+# while waiting on Gemini (or a batch-prediction job) starves the pool that
+# every other stage and API request shares.
+
+
+async def _stage_analysis(ctx: _RunContext) -> None:
+    """Analyze the reference image, or write a creative brief from the prompt."""
+    with Session(engine) as session:
+        generation = session.get(Generation, ctx.generation_id)
+        source_image = (
+            session.get(Image, generation.source_image_id)
+            if generation.source_image_id
+            else None
+        )
+    mode = generation.mode or "derive"
+
+    if generation.analysis_result:
+        # Resumed run: the analysis/brief was already paid for
+        analysis_json = generation.analysis_result
+    elif mode == "derive" and generation.source_image_id:
+        # Existing flow: analyze the source image
+        if not source_image:
+            raise ValueError("Source image not found")
+
+        image_path = await asyncio.to_thread(local_path, source_image.stored_path)
+
+        source = await asyncio.to_thread(prepare_image, image_path)
+        analysis_json = await analyze_image(
+            source,
+            product_images=ctx.reference_images or None,
+            product_metadata=ctx.product_context,
+            force_refresh=generation.force_refresh,
+        )
+    else:
+        # New flow: generate creative brief from prompt
+        analysis_json, match = await generate_creative_brief(
+            promotion_prompt=generation.promotion_prompt,
+            product_context=ctx.product_context,
+            design_style=generation.design_style,
+            product_images=ctx.reference_images or None,
+            force_refresh=generation.force_refresh,
+            generation_id=generation.id,
+        )
+        if match:
+            generation.prompt_similarity = match.score
+            generation.similar_generation_id = match.generation_id
+            generation.similarity_threshold = settings.PROMPT_SIMILARITY_THRESHOLD
+            generation.brief_reused = match.reused
+
+    with Session(engine) as session:
+        # Kept even if the generation was cancelled meanwhile: campaign
+        # followers take the analysis over
+        session.exec(
+            update(Generation)
+            .where(Generation.id == ctx.generation_id)
+            .values(
+                analysis_result=analysis_json,
+                prompt_similarity=generation.prompt_similarity,
+                similar_generation_id=generation.similar_generation_id,
+                similarity_threshold=generation.similarity_threshold,
+                brief_reused=generation.brief_reused,
+            )
+        )
+        session.commit()
+    if not _update_unfinished(Generation, ctx.generation_id, status="generating"):
+        raise _Stopped(f"Generation {ctx.generation_id} finished during analysis")
+
+    # Campaign cells with the same analysis inputs can start right away
+    _release_followers(ctx.generation_id)
+
+    ctx.analysis_json = analysis_json
+    try:
+        ctx.text_content = json.loads(analysis_json).get("text_content")
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        ctx.text_content = None
+
+
+async def _stage_adapt(ctx: _RunContext, result_id: int) -> None:
+    with Session(engine) as session:
+        result, target = _load_result(session, result_id)
+        needs_copy = result.adapted_text is None
+        target_info = {
+            "target_id": target.id,
+            "target_name": target.name,
+            "target_age": target.target_age,
+            "style_keywords": target.style_keywords,
+        }
+    if not _update_unfinished(GenerationResult, result_id, status="generating"):
+        raise _Stopped(f"Result {result_id} finished before adaptation")
+
+    if needs_copy and ctx.text_content and ctx.text_content.strip():
+        adapted_text = await adapt_text(
+            text_content=ctx.text_content, force_refresh=ctx.force_refresh, **target_info
+        )
+        if not _update_unfinished(GenerationResult, result_id, adapted_text=adapted_text):
+            raise _Stopped(f"Result {result_id} finished during adaptation")
+
+
+async def _stage_prompt(ctx: _RunContext, result_id: int) -> None:
+    with Session(engine) as session:
+        result, target = _load_result(session, result_id)
+        if result.prompt_used and result.stored_path:
+            return
+        result.prompt_used = build_prompt(
+            target.prompt_template,
+            ctx.analysis_json,
+            result.adapted_text,
+            ctx.product_context,
+            design_style=ctx.design_style,
+            has_reference_images=bool(ctx.reference_images),
+        )
+        session.add(result)
+        session.commit()
+
+
+async def _stage_image(ctx: _RunContext, result_id: int) -> None:
+    with Session(engine) as session:
+        result, _ = _load_result(session, result_id)
+
+    reused = None
+    generated = None  # stored path of a newly generated image
+    if not result.stored_path:
+        result.image_key = image_key(result.prompt_used, ctx.reference_images or None)
+        if settings.REUSE_GENERATED_IMAGES and not ctx.regenerate:
+            reused = await asyncio.to_thread(_find_reusable_image, result.image_key, result_id)
+
+        if reused:
+            result.reused_from_id, result.stored_path, result.renditions = reused
+            logger.info(f"Result {result_id} reuses the image of result {reused[0]}")
+        else:
+            stored_path = await generate_image(
+                result.prompt_used, reference_images=ctx.reference_images or None
+            )
+            if not stored_path:
+                raise ValueError("No image returned from generator")
+            result.stored_path = stored_path
+            generated = stored_path
+    values = {
+        # A local batch stand-in image must not be reused by online runs
+        "image_key": None if generated and returns_placeholders() else result.image_key,
+        "reused_from_id": result.reused_from_id,
+        "stored_path": result.stored_path,
+        "renditions": result.renditions,
+    }
+    if settings.BATCH_RATIONALE:
+        # Rationales are filled in afterwards by the batch stage
+        values["status"] = "completed"
+    # This row references the files too; a new image's reference comes from saving it
+    taken = [result.stored_path, *rendition_paths(result.renditions)] if reused else []
+    for path in taken:
+        await asyncio.to_thread(retain_blob, path)
+    if not _update_unfinished(GenerationResult, result_id, **values):
+        for path in taken or ([generated] if generated else []):
+            await asyncio.to_thread(release_blob, path)
+        raise _Stopped(f"Result {result_id} finished during image generation")
+
+    if reused:
+        with Session(engine) as session:
+            session.exec(
+                update(Generation)
+                .where(Generation.id == ctx.generation_id)
+                .values(reused_images=Generation.reused_images + 1)
+            )
+            session.commit()
+    if generated:
+        schedule_renditions(GenerationResult, result_id, generated)
+    elif reused and not result.renditions:
+        # The source's renditions were not ready (or failed); the same bytes
+        # render to the same blobs, so this only fills in this row's copy
+        schedule_renditions(GenerationResult, result_id, result.stored_path)
+
+
+def _find_reusable_image(key: str, result_id: int) -> tuple[int, str, str | None] | None:
+    """(id, stored_path, renditions) of the newest completed result with the
+    same image key whose file still exists."""
+    with Session(engine) as session:
+        candidates = session.exec(
+            select(GenerationResult.id, GenerationResult.stored_path, GenerationResult.renditions)
+            .where(
+                GenerationResult.image_key == key,
+                GenerationResult.status == "completed",
+                GenerationResult.id != result_id,
+                col(GenerationResult.stored_path).is_not(None),
+            )
+            .order_by(col(GenerationResult.id).desc())
+            .limit(5)
+        ).all()
+    for candidate_id, stored_path, renditions in candidates:
+        if file_exists(stored_path):
+            return candidate_id, stored_path, renditions
+    return None
+
+
+async def _stage_rationale(ctx: _RunContext, result_id: int) -> None:
+    with Session(engine) as session:
+        result, target = _load_result(session, result_id)
+
+    if result.rationale is None:
+        result.rationale = await generate_rationale(
+            analysis_json=ctx.analysis_json,
+            target_name=target.name,
+            target_age=target.target_age,
+            style_keywords=target.style_keywords,
+            adapted_text=result.adapted_text,
+            prompt_used=result.prompt_used,
+        )
+    if not _update_unfinished(
+        GenerationResult, result_id, rationale=result.rationale, status="completed"
+    ):
+        raise _Stopped(f"Result {result_id} finished during rationale generation")
+
+
+def _build_graph(ctx: _RunContext, result_ids: list[int]) -> StageGraph:
+    """Express one generation as a stage graph.
+
+    analysis → (batched adaptation) → per target: adapt → prompt → image →
+    rationale. Pro text stages and Flash image stages run in separate worker
+    pools, so the rationale for one target overlaps the image of another.
+    """
+    graph = StageGraph(limit=max(1, settings.GENERATION_STAGE_CONCURRENCY))
+    graph.add("analysis", lambda: _stage_analysis(ctx), pool="pro")
+
+    adapt_deps = ("analysis",)
+    if settings.BATCH_TEXT_ADAPTATION:
+
+        async def batch_adapt() -> None:
+            if ctx.text_content and ctx.text_content.strip():
+                await _batch_adapt_texts(ctx.generation_id, ctx.text_content, ctx.force_refresh)
+
+        graph.add("adapt_batch", batch_adapt, deps=("analysis",), pool="pro")
+        adapt_deps = ("adapt_batch",)
+
+    image_stages = []
+    for rid in result_ids:
+        graph.add(
+            f"adapt:{rid}",
+            _target_stage(rid, lambda rid=rid: _stage_adapt(ctx, rid)),
+            deps=adapt_deps,
+            pool="pro",
+        )
+        graph.add(
+            f"prompt:{rid}",
+            _target_stage(rid, lambda rid=rid: _stage_prompt(ctx, rid)),
+            deps=(f"adapt:{rid}",),
+        )
+        graph.add(
+            f"image:{rid}",
+            _target_stage(rid, lambda rid=rid: _stage_image(ctx, rid)),
+            deps=(f"prompt:{rid}",),
+            pool="image",
+        )
+        image_stages.append(f"image:{rid}")
+        if not settings.BATCH_RATIONALE:
+            graph.add(
+                f"rationale:{rid}",
+                _target_stage(rid, lambda rid=rid: _stage_rationale(ctx, rid)),
+                deps=(f"image:{rid}",),
+                pool="pro",
+            )
+
+    if settings.BATCH_RATIONALE:
+
+        async def batch_rationale() -> None:
+            if ctx.analysis_json:
+                await _batch_rationales(ctx.generation_id, ctx.analysis_json, ctx.design_style)
+
+        # Runs once every image has finished, successful or not
+        graph.add(
+            "rationale_batch",
+            batch_rationale,
+            deps=("analysis", *image_stages),
+            pool="pro",
+            run_on_failed_deps=True,
+        )
+
+    return graph
+
+
+async def _batch_adapt_texts(
+    generation_id: int,
+    text_content: str,
+    force_refresh: bool = False,
+) -> None:
+    """Adapt the copy for every unfinished target of a generation in one call.
+
+    The results are stored on the rows before fan-out. Targets missing from
+    the batched response keep ``adapted_text`` empty, so _stage_adapt falls
+    back to a per-target adapt_text call for them.
+    """
+    with Session(engine) as session:
+        pending = session.exec(
+            select(GenerationResult).where(
+                GenerationResult.generation_id == generation_id,
+                GenerationResult.status.not_in(FINAL_STATUSES),
+                col(GenerationResult.adapted_text).is_(None),
+            )
+        ).all()
+        if len(pending) < 2:
+            return
+
+        targets = {}
+        for result in pending:
+            target = session.get(Target, result.target_id)
+            if target:
+                targets[target.id] = {
+                    "id": target.id,
+                    "name": target.name,
+                    "target_age": target.target_age,
+                    "style_keywords": target.style_keywords,
+                }
+
+    adapted = await adapt_text_batch(text_content, list(targets.values()), force_refresh)
+    with Session(engine) as session:
+        for result in pending:
+            if result.target_id in adapted:
+                result.adapted_text = adapted[result.target_id]
+                session.add(result)
+        session.commit()
+
+
+async def _batch_rationales(
+    generation_id: int,
+    analysis_json: str,
+    design_style: str | None,
+) -> None:
+    """Generate rationales for all completed targets in chunked batch requests.
+
+    Each chunk shares the analysis context once instead of re-sending it per
+    target. Results missing from a batched response fall back to a
+    per-target generate_rationale call.
+    """
+    with Session(engine) as session:
+        results = session.exec(
+            select(GenerationResult).where(
+                GenerationResult.generation_id == generation_id,
+                GenerationResult.status == "completed",
+                col(GenerationResult.rationale).is_(None),
+            )
+        ).all()
+        if not results:
+            return
+
+        targets = {r.id: session.get(Target, r.target_id) for r in results}
+        items = [
+            {
+                "result_id": r.id,
+                "target_name": targets[r.id].name,
+                "target_age": targets[r.id].target_age,
+                "style_keywords": targets[r.id].style_keywords,
+                "adapted_text": r.adapted_text,
+                "prompt_template": targets[r.id].prompt_template,
+            }
+            for r in results
+            if targets[r.id]
+        ]
+    size = max(1, settings.RATIONALE_BATCH_SIZE)
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    style_directive = DESIGN_STYLE_DIRECTIVES.get(design_style or "")
+
+    rationales: dict[int, str] = {}
+    for chunk_result in await asyncio.gather(
+        *(generate_rationales_batch(analysis_json, chunk, style_directive) for chunk in chunks)
+    ):
+        rationales.update(chunk_result)
+
+    missing = [r for r in results if r.id not in rationales and targets[r.id]]
+    fallback = await asyncio.gather(
+        *(
+            generate_rationale(
+                analysis_json=analysis_json,
+                target_name=targets[r.id].name,
+                target_age=targets[r.id].target_age,
+                style_keywords=targets[r.id].style_keywords,
+                adapted_text=r.adapted_text,
+                prompt_used=r.prompt_used or "",
+            )
+            for r in missing
+        )
+    )
+    for r, rationale in zip(missing, fallback):
+        if rationale:
+            rationales[r.id] = rationale
+
+    with Session(engine) as session:
+        for r in results:
+            if r.id in rationales:
+                r.rationale = rationales[r.id]
+                session.add(r)
+        session.commit()
+
+
+def _close_results(session: Session, generation_id: int, status: str, error: str) -> None:
+    """Move every unfinished result of a generation to a final ``status``."""
+    results = session.exec(
+        select(GenerationResult).where(
+            GenerationResult.generation_id == generation_id,
+            GenerationResult.status.not_in(FINAL_STATUSES),
+        )
+    ).all()
+    for result in results:
+        result.status = status
+        result.error = error
+        session.add(result)
+
+
+def cancel_generation(generation_id: int) -> bool:
+    """Mark a generation and its unfinished results cancelled.
+
+    Queued jobs for it are dropped; a worker running it notices the status
+    within CANCEL_POLL_SECONDS and aborts its in-flight stages. Returns False
+    if the generation had already completed or failed.
+    """
+    with Session(engine) as session:
+        generation = session.get(Generation, generation_id)
+        if not generation or generation.status in ("completed", "failed"):
+            return False
+
+        if generation.status != "cancelled":
+            generation.status = "cancelled"
+            generation.error = "Cancelled by user"
+            generation.completed_at = datetime.utcnow()
+            session.add(generation)
+        _close_results(session, generation_id, "cancelled", "Cancelled by user")
+        session.commit()
+
+    get_job_queue().cancel_queued(generation_id)
+    return True
+
+
+def _release_followers(leader_id: int) -> None:
+    """Start the campaign cells that wait on this generation's analysis.
+
+    Followers take over the leader's analysis_result when it has one; if
+    the leader stopped before analysing (failed or cancelled), they are
+    queued anyway and run their own analysis.
+    """
+    with Session(engine) as session:
+        leader = session.get(Generation, leader_id)
+        followers = session.exec(
+            select(Generation).where(
+                Generation.analysis_leader_id == leader_id,
+                Generation.status == "pending",
+            )
+        ).all()
+        for follower in followers:
+            if session.exec(select(Job.id).where(Job.generation_id == follower.id)).first():
+                continue
+            if leader and leader.analysis_result and not follower.analysis_result:
+                follower.analysis_result = leader.analysis_result
+                session.add(follower)
+                session.commit()
+            get_job_queue().enqueue(
+                "generation",
+                {"generation_id": follower.id},
+                generation_id=follower.id,
+                priority=follower.priority,
+            )
+
+
+def _remaining_seconds(started_at: datetime) -> float:
+    # Batch-prediction jobs can take hours; give batched runs their own deadline
+    limit = (
+        settings.BATCH_DEADLINE_SECONDS
+        if use_batch_prediction()
+        else settings.GENERATION_DEADLINE_SECONDS
+    )
+    deadline = started_at + timedelta(seconds=limit)
+    return max(0.0, (deadline - datetime.utcnow()).total_seconds())
+
+
+async def _run_generation(session: Session, generation: Generation) -> str:
+    """Run the stage graph for a generation; returns its final status."""
+    generation_id = generation.id
+    if not generation.analysis_result:
+        if not _update_unfinished(Generation, generation_id, status="analyzing"):
+            raise _Stopped(f"Generation {generation_id} finished before it started")
+
+    ctx = _RunContext(
+        generation_id=generation_id,
+        design_style=generation.design_style,
+        force_refresh=generation.force_refresh,
+        regenerate=generation.regenerate,
+    )
+
+    # Get product info if linked (supports multiple products)
+    products: list[Product] = []
+
+    if generation.product_ids:
+        try:
+            pids = json.loads(generation.product_ids)
+            for pid in pids:
+                p = session.get(Product, pid)
+                if p:
+                    products.append(p)
+        except (json.JSONDecodeError, TypeError):
+            pass
+    elif generation.product_id:
+        p = session.get(Product, generation.product_id)
+        if p:
+            products.append(p)
+
+    if products:
+        ctx.product_context = _build_multi_product_context(products)
+        paths = await asyncio.gather(*(resolve_product_image(p.id) for p in products))
+        product_image_paths = [path for path in paths if path]
+        ctx.reference_images = await asyncio.to_thread(prepare_images, product_image_paths)
+
+    result_ids = session.exec(
+        select(GenerationResult.id).where(
+            GenerationResult.generation_id == generation_id,
+            GenerationResult.status.not_in(FINAL_STATUSES),
+        )
+    ).all()
+
+    # End the read transaction so this session holds no connection while
+    # the stages run
+    session.commit()
+    outcomes = await _build_graph(ctx, list(result_ids)).run()
+    if outcomes["analysis"] is not None:
+        raise outcomes["analysis"]
+
+    # Include results finished by an earlier (interrupted) run
+    session.expire_all()
+    statuses = session.exec(
+        select(GenerationResult.status).where(
+            GenerationResult.generation_id == generation_id
+        )
+    ).all()
+    return "completed" if all(status == "completed" for status in statuses) else "failed"
+
+
+async def run_pipeline(generation_id: int):
+    with Session(engine) as session:
+        generation = session.get(Generation, generation_id)
+        if not generation or generation.status in FINAL_STATUSES:
+            return
+
+        try:
+            await _run_to_end(session, generation)
+        finally:
+            _release_followers(generation_id)
+
+
+async def _run_to_end(session: Session, generation: Generation) -> None:
+    generation_id = generation.id
+    # Stage pools and rate limiters queue this run's calls under its class
+    current_priority.set(generation.priority)
+    error = None
+    # Each run (a resume after a crash included) gets the full budget from
+    # when it starts; RECOVERY_MAX_RESUMES bounds how often that happens
+    started_at = datetime.utcnow()
+    _update_unfinished(Generation, generation_id, started_at=started_at)
+    deadline = asyncio.timeout(_remaining_seconds(started_at))
+    try:
+        async with deadline:
+            status = await _run_generation(session, generation)
+    except _Stopped as e:
+        logger.info(f"Generation {generation_id} stopped: {e}")
+        return
+    except Exception as e:
+        status = "failed"
+        error = "Generation deadline exceeded" if deadline.expired() else str(e)
+        _close_results(session, generation_id, "failed", error)
+        session.commit()
+        logger.error(f"Pipeline failed for generation {generation_id}: {error}")
+
+    # A cancel request may have landed while the last stages were running
+    values = {"status": status, "completed_at": datetime.utcnow()}
+    if error:
+        values["error"] = error
+    _update_unfinished(Generation, generation_id, **values)
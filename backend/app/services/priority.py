@@ -0,0 +1,99 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from app.config import settings
+
+# Priority class of the generation whose pipeline is running in the current
+# task. run_pipeline sets it; stage pools and rate limiters read it, so every
+# Gemini call is queued under the class of the generation that made it.
+current_priority: ContextVar[str] = ContextVar(
+    "current_priority", default=settings.DEFAULT_PRIORITY
+)
+
+
+def priority_weight(priority: str) -> float:
+    return max(0.01, float(settings.PRIORITY_WEIGHTS.get(priority, 1)))
+
+
+class StridePicker:
+    """Weighted fair choice between priority classes (stride scheduling).
+
+    Each class advances its ``pass`` by 1/weight whenever it is picked and
+    the class with the lowest pass goes next, so with weights 4:1 a busy
+    interactive class gets four turns for every bulk turn, but bulk never
+    starves. A class that was idle rejoins at the current virtual time
+    rather than cashing in the turns it skipped.
+    """
+
+    def __init__(self):
+        self._pass: dict[str, float] = {}
+        self._vtime = 0.0
+
+    def pick(self, classes: list[str] | set[str]) -> str:
+        for cls in classes:
+            self._pass[cls] = max(self._pass.get(cls, self._vtime), self._vtime)
+        # Ties go to the heavier class, i.e. interactive before bulk
+        chosen = min(classes, key=lambda c: (self._pass[c], -priority_weight(c), c))
+        self._vtime = self._pass[chosen]
+        self._pass[chosen] += 1 / priority_weight(chosen)
+        return chosen
+
+
+class FairGate:
+    """Counting semaphore that hands freed slots to waiters by priority class.
+
+    Waiters of one class are served FIFO; between classes the next slot goes
+    to the class chosen by a StridePicker.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self.in_use = 0
+        self._waiters: dict[str, deque[asyncio.Future]] = {}
+        self._picker = StridePicker()
+
+    def waiting(self) -> dict[str, int]:
+        return {cls: len(q) for cls, q in self._waiters.items() if q}
+
+    async def acquire(self, priority: str) -> None:
+        if self.in_use < self.size and not any(self._waiters.values()):
+            self.in_use += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._waiters.setdefault(priority, deque())
+        queue.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self.release()
+            elif future in queue:
+                queue.remove(future)
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self.in_use < self.size:
+            classes = [cls for cls, q in self._waiters.items() if q]
+            if not classes:
+                return
+            future = self._waiters[self._picker.pick(classes)].popleft()
+            if future.done():
+                continue
+            self.in_use += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: str | None = None):
+        await self.acquire(priority or current_priority.get())
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,215 @@
+"""Product images resolved from ``Product.image_url``.
+
+Each URL has a RemoteImage row remembering the downloaded Image, the
+response validators and recent failures:
+
+- a download younger than PRODUCT_IMAGE_REVALIDATE_SECONDS is used as is;
+  an older one is revalidated with If-None-Match / If-Modified-Since, so an
+  unchanged image costs a 304 instead of a full download;
+- a failed attempt is not repeated before ``retry_after``, which backs off
+  exponentially from PRODUCT_IMAGE_RETRY_BASE_SECONDS; meanwhile callers
+  get the last good image, if any;
+- concurrent callers for one URL share a single request.
+
+Products are resolved when they are created (PRODUCT_IMAGE_PREFETCH) so a
+generation normally finds the image already on disk.
+"""
+import asyncio
+import logging
+import mimetypes
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine
+from app.models.db import Image, Product, RemoteImage
+from app.services.http_client import get_http_client
+from app.services.renditions import schedule_renditions
+from app.services.storage import local_path, save_bytes
+
+logger = logging.getLogger(__name__)
+
+_stats = {
+    "downloads": 0,
+    "not_modified": 0,
+    "fresh": 0,
+    "failures": 0,
+    "skipped_backoff": 0,
+    "joined_in_flight": 0,
+}
+_in_flight: dict[str, asyncio.Task] = {}
+
+
+def _remote_row(session: Session, url: str) -> RemoteImage:
+    remote = session.exec(select(RemoteImage).where(RemoteImage.url == url)).first()
+    if remote is None:
+        try:
+            remote = RemoteImage(url=url)
+            session.add(remote)
+            session.commit()
+            session.refresh(remote)
+        except IntegrityError:
+            # Another process registered the URL first
+            session.rollback()
+            remote = session.exec(select(RemoteImage).where(RemoteImage.url == url)).one()
+    return remote
+
+
+def _record_failure(url: str, error: Exception) -> None:
+    with Session(engine) as session:
+        remote = _remote_row(session, url)
+        remote.failures += 1
+        delay = min(
+            settings.PRODUCT_IMAGE_RETRY_BASE_SECONDS * 2 ** (remote.failures - 1),
+            settings.PRODUCT_IMAGE_RETRY_MAX_SECONDS,
+        )
+        remote.retry_after = datetime.utcnow() + timedelta(seconds=delay)
+        remote.last_error = str(error)[:500]
+        session.add(remote)
+        session.commit()
+    _stats["failures"] += 1
+    logger.warning(f"Failed to download image from {url}: {error} (next attempt in {delay:.0f}s)")
+
+
+async def _fetch(url: str) -> int | None:
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        remote = _remote_row(session, url)
+        image_id = remote.image_id if remote.image_id and session.get(Image, remote.image_id) else None
+        etag, last_modified = remote.etag, remote.last_modified
+        checked_at, retry_after = remote.checked_at, remote.retry_after
+
+    if image_id and checked_at and now - checked_at < timedelta(
+        seconds=settings.PRODUCT_IMAGE_REVALIDATE_SECONDS
+    ):
+        _stats["fresh"] += 1
+        return image_id
+    if retry_after and now < retry_after:
+        _stats["skipped_backoff"] += 1
+        return image_id
+
+    headers = {}
+    if image_id:
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    try:
+        response = await get_http_client().get(url, headers=headers)
+        if response.status_code == 304 and image_id:
+            with Session(engine) as session:
+                remote = _remote_row(session, url)
+                remote.checked_at = now
+                remote.failures = 0
+                remote.retry_after = None
+                session.add(remote)
+                session.commit()
+            _stats["not_modified"] += 1
+            return image_id
+
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        if not content_type.startswith("image/"):
+            raise ValueError(f"Not an image ({content_type or 'no content type'})")
+        data = response.content
+    except Exception as e:
+        _record_failure(url, e)
+        return image_id
+
+    filename = f"product{mimetypes.guess_extension(content_type) or '.img'}"
+    stored_path = await asyncio.to_thread(save_bytes, data, filename)
+    with Session(engine) as session:
+        img = Image(
+            filename=filename,
+            stored_path=stored_path,
+            mime_type=content_type,
+            size_bytes=len(data),
+        )
+        session.add(img)
+        session.flush()
+        remote = _remote_row(session, url)
+        remote.image_id = img.id
+        remote.etag = response.headers.get("etag")
+        remote.last_modified = response.headers.get("last-modified")
+        remote.checked_at = now
+        remote.failures = 0
+        remote.retry_after = None
+        remote.last_error = None
+        session.add(remote)
+        session.commit()
+        _stats["downloads"] += 1
+        schedule_renditions(Image, img.id, stored_path)
+        return img.id
+
+
+async def fetch_remote_image(url: str) -> int | None:
+    """Image id for ``url``, downloading or revalidating it when due."""
+    task = _in_flight.get(url)
+    if task is None:
+        task = asyncio.create_task(_fetch(url))
+        _in_flight[url] = task
+        task.add_done_callback(lambda _: _in_flight.pop(url, None))
+    else:
+        _stats["joined_in_flight"] += 1
+    # One caller giving up must not cancel the download for the others
+    return await asyncio.shield(task)
+
+
+async def resolve_product_image(product_id: int) -> str | None:
+    """Resolve a product's image to a local file path.
+
+    1. An image attached to the product directly (uploaded, not downloaded
+       from a URL) is used as is.
+    2. Otherwise, with an image_url, the downloaded image for that URL is
+       fetched or revalidated and the product's image_id follows it.
+    3. If neither exists, or nothing was ever downloaded, return None. A
+       failed refresh keeps the image downloaded earlier.
+    """
+    with Session(engine) as session:
+        product = session.get(Product, product_id)
+        if not product:
+            return None
+        url, image_id = product.image_url, product.image_id
+        downloaded = image_id is None or session.exec(
+            select(RemoteImage.id).where(RemoteImage.image_id == image_id)
+        ).first() is not None
+
+    if url and downloaded:
+        fetched = await fetch_remote_image(url)
+        if fetched is not None and fetched != image_id:
+            with Session(engine) as session:
+                product = session.get(Product, product_id)
+                if product:
+                    product.image_id = fetched
+                    session.add(product)
+                    session.commit()
+            image_id = fetched
+
+    if image_id is None:
+        return None
+    with Session(engine) as session:
+        img = session.get(Image, image_id)
+    return await asyncio.to_thread(local_path, img.stored_path) if img else None
+
+
+async def prefetch_product_image(product_id: int) -> None:
+    try:
+        await resolve_product_image(product_id)
+    except Exception as e:
+        logger.warning(f"Prefetch of product {product_id} image failed: {e}")
+
+
+async def prefetch_product_images() -> None:
+    """Resolve every product that has an image_url (run at startup)."""
+    with Session(engine) as session:
+        product_ids = session.exec(
+            select(Product.id).where(Product.image_url.is_not(None))
+        ).all()
+    await asyncio.gather(*(prefetch_product_image(pid) for pid in product_ids))
+
+
+def product_image_stats() -> dict:
+    return {**_stats, "in_flight": len(_in_flight)}
@@ -1,10 +1,8 @@
 import json
 import logging
 
-import httpx
-from google import genai
-
-from app.config import settings
+from app.services.genai_client import generate_content
+from app.services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -31,16 +29,9 @@ MAX_HTML_LENGTH = 30000
 
 async def scrape_product(url: str) -> dict:
     """Fetch a product URL and extract structured product data using Gemini."""
-    async with httpx.AsyncClient(
-        follow_redirects=True,
-        timeout=15.0,
-        headers={
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        },
-    ) as http_client:
-        response = await http_client.get(url)
-        response.raise_for_status()
-        html = response.text
+    response = await get_http_client().get(url, timeout=15.0)
+    response.raise_for_status()
+    html = response.text
 
     # Truncate HTML to avoid token limits
     if len(html) > MAX_HTML_LENGTH:
@@ -48,13 +39,7 @@ async def scrape_product(url: str) -> dict:
 
     prompt = EXTRACTION_PROMPT.format(html_content=html)
 
-    client = genai.Client(
-        vertexai=True,
-        project=settings.GCP_PROJECT_ID,
-        location=settings.GCP_LOCATION,
-    )
-
-    gemini_response = client.models.generate_content(
+    gemini_response = await generate_content(
         model="gemini-3.1-pro-preview",
         contents=[prompt],
     )
@@ -74,18 +59,11 @@ async def scrape_product(url: str) -> dict:
 async def download_image(url: str) -> bytes | None:
     """Download an image from a URL. Returns bytes or None on failure."""
     try:
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=10.0,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-            },
-        ) as http_client:
-            response = await http_client.get(url)
-            response.raise_for_status()
-            content_type = response.headers.get("content-type", "")
-            if "image" in content_type:
-                return response.content
+        response = await get_http_client().get(url)
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "")
+        if "image" in content_type:
+            return response.content
     except Exception as e:
         logger.warning(f"Failed to download image from {url}: {e}")
     return None
@@ -0,0 +1,162 @@
+"""Near-duplicate detection for promotion prompts (MinHash + LSH, CPU only).
+
+Prompts are canonicalized (lowercased, punctuation and whitespace dropped)
+and cut into character shingles, which suits Korean copy where a changed
+particle or spacing should barely move the score. Each prompt gets a
+MinHash signature; the estimated Jaccard similarity of two prompts is the
+fraction of matching signature slots.
+
+Signatures are stored in the ``promptsignature`` table, scoped by a context
+key covering every other creative-brief input (products, style, product
+images, prompt version): a prompt is only compared with prompts whose brief
+would otherwise have been identical. Lookups go through an in-memory LSH
+index per context; each lookup first loads the rows added since the last
+one, so prompts remembered by other API or worker processes are found too.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+from dataclasses import dataclass
+
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models.db import PromptSignature
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: prompts at 0.8 similarity collide with ~99.9% probability
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)
+]
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def canonicalize(text: str | None) -> str:
+    return _NON_WORD.sub("", (text or "").lower())
+
+
+def shingles(text: str | None) -> set[str]:
+    canonical = canonicalize(text)
+    if len(canonical) <= SHINGLE_SIZE:
+        return {canonical} if canonical else set()
+    return {canonical[i : i + SHINGLE_SIZE] for i in range(len(canonical) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str | None) -> list[int]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+        for s in shingles(text)
+    ]
+    if not hashes:
+        return [_MERSENNE] * NUM_PERM
+    return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def _bands(signature: list[int]) -> list[tuple]:
+    return [tuple(signature[i * ROWS : (i + 1) * ROWS]) for i in range(BANDS)]
+
+
+@dataclass
+class PromptMatch:
+    score: float
+    prompt: str
+    brief_key: str
+    generation_id: int | None
+    reused: bool = False  # set by the caller when the matched brief was used
+
+
+@dataclass
+class _Entry:
+    signature: list[int]
+    prompt: str
+    brief_key: str
+    generation_id: int | None
+
+
+class _ContextIndex:
+    def __init__(self):
+        self.entries: list[_Entry] = []
+        self.buckets: dict[tuple[int, tuple], list[int]] = {}
+        self.last_id = 0  # highest promptsignature id loaded
+
+    def add(self, entry: _Entry) -> None:
+        position = len(self.entries)
+        self.entries.append(entry)
+        for band, rows in enumerate(_bands(entry.signature)):
+            self.buckets.setdefault((band, rows), []).append(position)
+
+    def best(self, signature: list[int]) -> _Entry | None:
+        candidates = {
+            position
+            for band, rows in enumerate(_bands(signature))
+            for position in self.buckets.get((band, rows), ())
+        }
+        if not candidates:
+            return None
+        # The newest entry wins a tie
+        best = max(candidates, key=lambda p: (similarity(signature, self.entries[p].signature), p))
+        return self.entries[best]
+
+
+_indexes: dict[str, _ContextIndex] = {}
+_lock = threading.Lock()
+
+
+def _index(context_key: str) -> _ContextIndex:
+    """The context's index, brought up to date with the table."""
+    index = _indexes.setdefault(context_key, _ContextIndex())
+    with Session(engine) as session:
+        rows = session.exec(
+            select(PromptSignature)
+            .where(
+                PromptSignature.context_key == context_key,
+                PromptSignature.id > index.last_id,
+            )
+            .order_by(PromptSignature.id)
+        ).all()
+    for row in rows:
+        index.add(_Entry(json.loads(row.signature), row.prompt, row.brief_key, row.generation_id))
+        index.last_id = row.id
+    return index
+
+
+def find_similar(context_key: str, prompt: str) -> PromptMatch | None:
+    """Best earlier prompt of the same context that shares an LSH band."""
+    signature = minhash(prompt)
+    with _lock:
+        entry = _index(context_key).best(signature)
+    if entry is None:
+        return None
+    return PromptMatch(
+        score=round(similarity(signature, entry.signature), 4),
+        prompt=entry.prompt,
+        brief_key=entry.brief_key,
+        generation_id=entry.generation_id,
+    )
+
+
+def remember(context_key: str, prompt: str, brief_key: str, generation_id: int | None) -> None:
+    signature = minhash(prompt)
+    with Session(engine) as session:
+        session.add(
+            PromptSignature(
+                context_key=context_key,
+                prompt=prompt,
+                signature=json.dumps(signature),
+                brief_key=brief_key,
+                generation_id=generation_id,
+            )
+        )
+        session.commit()
+    # Every process's index picks the row up on its next lookup
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from email.utils import parsedate_to_datetime
+from typing import TypeVar
+
+from app.config import settings
+from app.services.priority import FairGate
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ModelRateLimiter:
+    """Token bucket for one Gemini model with AIMD rate adjustment.
+
+    The bucket refills at ``rate`` requests/second up to ``burst`` tokens.
+    Every success nudges the rate up additively (towards the configured
+    ceiling); every 429 / RESOURCE_EXHAUSTED halves it and, when the server
+    sent Retry-After, pauses the whole bucket until that time. Waiters take
+    turns through a FairGate, FIFO within a priority class and weighted
+    between classes, so concurrent pipelines share the quota instead of
+    stampeding it and interactive work is not stuck behind bulk sweeps.
+    """
+
+    def __init__(self, model: str, max_rpm: float):
+        self.model = model
+        self.max_rate = max_rpm / 60
+        self.min_rate = min(settings.RATE_LIMIT_MIN_RPM, max_rpm) / 60
+        self.rate = self.max_rate
+        self.burst = max(1.0, settings.RATE_LIMIT_BURST)
+        self.tokens = self.burst
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.throttled = 0
+        self.requests = 0
+        self._updated = time.monotonic()
+        self._gate = FairGate(1)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        self.waiting += 1
+        try:
+            async with self._gate.slot():
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self.blocked_until:
+                        await asyncio.sleep(self.blocked_until - now)
+                        continue
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.requests += 1
+                        return
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def on_success(self) -> None:
+        step = settings.RATE_LIMIT_INCREASE_RPM / 60
+        self.rate = min(self.max_rate, self.rate + step)
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate * settings.RATE_LIMIT_DECREASE_FACTOR)
+        # Drop accumulated burst so queued callers do not fire straight into the 429
+        self.tokens = min(self.tokens, 0.0)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        logger.warning(
+            f"Rate limited on {self.model}; rate now {self.rate * 60:.1f} rpm"
+            + (f", pausing {retry_after:.1f}s" if retry_after else "")
+        )
+
+    def stats(self) -> dict:
+        return {
+            "rate_rpm": round(self.rate * 60, 2),
+            "max_rpm": round(self.max_rate * 60, 2),
+            "queue_depth": self.waiting,
+            "waiting_by_priority": self._gate.waiting(),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "paused_for": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+        }
+
+
+_limiters: dict[str, ModelRateLimiter] = {}
+
+
+def get_limiter(model: str) -> ModelRateLimiter:
+    limiter = _limiters.get(model)
+    if limiter is None:
+        rpm = settings.RATE_LIMIT_RPM.get(model, settings.RATE_LIMIT_DEFAULT_RPM)
+        limiter = ModelRateLimiter(model, rpm)
+        _limiters[model] = limiter
+    return limiter
+
+
+def is_rate_limited(error: Exception) -> bool:
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Read Retry-After (seconds or HTTP date) from the error's HTTP response."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after")
+    except Exception:
+        return None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter over the upper half of each step."""
+    ceiling = min(
+        settings.RATE_LIMIT_BACKOFF_MAX,
+        settings.RATE_LIMIT_BACKOFF_BASE * (2 ** attempt),
+    )
+    return random.uniform(ceiling / 2, ceiling)
+
+
+async def call_with_rate_limit(model: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Run ``call`` through the model's limiter, retrying on rate-limit errors."""
+    limiter = get_limiter(model)
+    max_retries = settings.RATE_LIMIT_MAX_RETRIES
+    attempt = 0
+
+    while True:
+        await limiter.acquire()
+        try:
+            result = await call()
+        except Exception as e:
+            if not is_rate_limited(e):
+                raise
+            retry_after = retry_after_seconds(e)
+            limiter.on_throttle(retry_after)
+            if attempt >= max_retries:
+                raise
+            attempt += 1
+            # With Retry-After the limiter itself is paused; otherwise back off
+            if retry_after is None:
+                wait = backoff_delay(attempt - 1)
+                logger.warning(
+                    f"{model} rate limited, retrying in {wait:.1f}s "
+                    f"(attempt {attempt}/{max_retries})"
+                )
+                await asyncio.sleep(wait)
+            continue
+        limiter.on_success()
+        return result
+
+
+def limiter_stats() -> dict:
+    return {model: limiter.stats() for model, limiter in _limiters.items()}
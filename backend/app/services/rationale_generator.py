@@ -1,9 +1,12 @@
 import json
 import logging
+import re
 
-from google import genai
+from google.genai import types
+from pydantic import BaseModel
 
-from app.config import settings
+from app.services.genai_client import generate_content
+from app.services.text_adapter import format_keywords
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +34,36 @@ RATIONALE_PROMPT = """당신은 한국 뷰티 마케팅 전문가입니다.
 
 설명만 반환해주세요. 번호 매기기나 서식 없이 자연스러운 문장으로 작성합니다."""
 
+BATCH_RATIONALE_PROMPT = """당신은 한국 뷰티 마케팅 전문가입니다.
+원본 프로모션 이미지 분석 결과와 여러 타겟 정보를 바탕으로, 각 타겟에 맞는 이미지 변환이 왜 효과적인지 근거를 설명해주세요.
+
+원본 이미지 분석 (모든 타겟 공통):
+{analysis_json}
+
+공통 디자인 스타일 디렉션:
+{style_directive}
+
+타겟별 정보:
+{targets}
+
+각 타겟마다 다음 관점에서 한국어 3-5문장으로 설명해주세요:
+1. 이 세대의 한국 소비자가 어떤 비주얼에 반응하는지
+2. 색상/조명/구도 변화가 타겟에게 왜 효과적인지
+3. 텍스트가 변환된 경우, 해당 카피가 타겟에 왜 적합한지
+4. 원본 대비 어떤 마케팅 효과 개선이 기대되는지
+
+각 타겟의 result_id와 설명(rationale)을 반환해주세요. 설명은 번호 매기기나 서식 없이 자연스러운 문장으로 작성합니다."""
+
+
+class TargetRationale(BaseModel):
+    result_id: int
+    rationale: str
+
+
+def _visual_direction(prompt_template: str) -> str:
+    """Target-specific part of the image prompt, without the shared sections."""
+    return re.sub(r"\{(analysis_context|style_directive|text_instruction)\}", "", prompt_template).strip()
+
 
 async def generate_rationale(
     analysis_json: str,
@@ -41,29 +74,17 @@ async def generate_rationale(
     prompt_used: str,
 ) -> str | None:
     """Generate a rationale for the target transformation in Korean."""
-    client = genai.Client(
-        vertexai=True,
-        project=settings.GCP_PROJECT_ID,
-        location=settings.GCP_LOCATION,
-    )
-
-    try:
-        kw_list = json.loads(style_keywords)
-        kw_str = ", ".join(kw_list)
-    except (json.JSONDecodeError, TypeError):
-        kw_str = style_keywords
-
     prompt = RATIONALE_PROMPT.format(
         analysis_json=analysis_json,
         target_name=target_name,
         target_age=target_age,
-        style_keywords=kw_str,
+        style_keywords=format_keywords(style_keywords),
         adapted_text=adapted_text or "(원본에 텍스트 없음)",
         prompt_used=prompt_used,
     )
 
     try:
-        response = client.models.generate_content(
+        response = await generate_content(
             model="gemini-3.1-pro-preview",
             contents=[prompt],
         )
@@ -73,3 +94,59 @@ async def generate_rationale(
     except Exception as e:
         logger.error(f"Rationale generation failed for {target_name}: {e}")
         return None
+
+
+async def generate_rationales_batch(
+    analysis_json: str,
+    items: list[dict],
+    style_directive: str | None = None,
+) -> dict[int, str]:
+    """Generate rationales for several completed targets in one request.
+
+    The analysis and design style are sent once; each item only carries its
+    target-specific fields (``result_id``, ``target_name``, ``target_age``,
+    ``style_keywords``, ``adapted_text``, ``prompt_template``). Returns
+    ``{result_id: rationale}`` for the items present in the response.
+    """
+    if not items:
+        return {}
+
+    target_blocks = "\n\n".join(
+        f"[result_id {item['result_id']}]\n"
+        f"- 이름: {item['target_name']}\n"
+        f"- 연령대: {item['target_age']}\n"
+        f"- 스타일 키워드: {format_keywords(item['style_keywords'])}\n"
+        f"- 타겟 맞춤 텍스트 (이미지에 반영됨): {item.get('adapted_text') or '(원본에 텍스트 없음)'}\n"
+        f"- 적용된 비주얼 디렉션: {_visual_direction(item['prompt_template'])}"
+        for item in items
+    )
+    prompt = BATCH_RATIONALE_PROMPT.format(
+        analysis_json=analysis_json,
+        style_directive=style_directive or "(지정 없음)",
+        targets=target_blocks,
+    )
+
+    try:
+        response = await generate_content(
+            model="gemini-3.1-pro-preview",
+            contents=[prompt],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=list[TargetRationale],
+            ),
+        )
+        parsed = response.parsed
+        if parsed is None:
+            parsed = [TargetRationale(**item) for item in json.loads(response.text)]
+    except Exception as e:
+        logger.error(f"Batched rationale generation failed: {e}")
+        return {}
+
+    wanted = {item["result_id"] for item in items}
+    rationales = {
+        r.result_id: r.rationale.strip()
+        for r in parsed
+        if r.result_id in wanted and r.rationale.strip()
+    }
+    logger.info(f"Batched rationale returned {len(rationales)}/{len(items)} targets")
+    return rationales
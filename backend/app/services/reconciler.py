@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.database import engine
+from app.models.db import Generation, GenerationResult, Job
+from app.services.job_queue import get_job_queue
+from app.services.pipeline import FINAL_STATUSES, IN_FLIGHT_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+def _is_live(job: Job, now: datetime) -> bool:
+    """Whether a job is still queued, running, or will be reclaimed by a worker."""
+    if job.status == "queued":
+        return True
+    if job.status != "running":
+        return False
+    lease_valid = job.lease_expires_at is not None and job.lease_expires_at >= now
+    return lease_valid or job.attempts < settings.JOB_MAX_ATTEMPTS
+
+
+def reconcile_orphans() -> int:
+    """Resume in-flight generations that no live job is working on.
+
+    A generation is orphaned when its process died mid-pipeline (or it
+    predates the job queue) and every job for it has finished or given up.
+    Orphans get a fresh job; run_pipeline then resumes from the last stage
+    stored on the generation and its results. Generations interrupted more
+    than RECOVERY_MAX_RESUMES times are marked failed instead.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.RECOVERY_GRACE_SECONDS)
+    resumed = 0
+
+    with Session(engine) as session:
+        generations = session.exec(
+            select(Generation).where(
+                Generation.status.in_(IN_FLIGHT_STATUSES),
+                Generation.created_at < cutoff,
+            )
+        ).all()
+
+        for generation in generations:
+            jobs = session.exec(select(Job).where(Job.generation_id == generation.id)).all()
+            if any(_is_live(job, now) for job in jobs):
+                continue
+
+            if not jobs and generation.analysis_leader_id:
+                # Campaign cell still waiting for its leader's analysis
+                leader = session.get(Generation, generation.analysis_leader_id)
+                if leader and leader.status in IN_FLIGHT_STATUSES:
+                    continue
+
+            if len(jobs) > settings.RECOVERY_MAX_RESUMES:
+                _give_up(session, generation, now)
+                continue
+
+            get_job_queue().enqueue(
+                "generation",
+                {"generation_id": generation.id},
+                generation_id=generation.id,
+                priority=generation.priority,
+            )
+            resumed += 1
+            logger.warning(
+                f"Resuming orphaned generation {generation.id} "
+                f"(status={generation.status}, previous jobs={len(jobs)})"
+            )
+
+    return resumed
+
+
+def _give_up(session: Session, generation: Generation, now: datetime) -> None:
+    error = "Generation was interrupted too many times"
+    results = session.exec(
+        select(GenerationResult).where(
+            GenerationResult.generation_id == generation.id,
+            GenerationResult.status.not_in(FINAL_STATUSES),
+        )
+    ).all()
+    for result in results:
+        result.status = "failed"
+        result.error = error
+        session.add(result)
+
+    generation.status = "failed"
+    generation.error = error
+    generation.completed_at = now
+    session.add(generation)
+    session.commit()
+    logger.error(f"Giving up on generation {generation.id}: {error}")
+
+
+async def run_reconciler(stop: asyncio.Event) -> None:
+    """Reconcile once at startup, then every RECOVERY_INTERVAL_SECONDS."""
+    while not stop.is_set():
+        try:
+            await asyncio.to_thread(reconcile_orphans)
+        except Exception as e:
+            logger.error(f"Reconciler pass failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.RECOVERY_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
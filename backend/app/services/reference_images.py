@@ -0,0 +1,99 @@
+"""Reference images prepared once and shared by every stage that sends them.
+
+Product photos and uploaded promotions can be many megapixels, while the
+models only look at roughly REFERENCE_IMAGE_MAX_SIDE pixels. Preparing an
+image decodes it once, applies the EXIF orientation, downsizes it and
+encodes it compactly (JPEG, or PNG when it has transparency). The resulting
+bytes are sent as an inline part, so retries and later stages re-send the
+same payload without touching PIL again.
+
+Prepared images are memoized in-process by path, modification time and size,
+so a job retry or a campaign cell using the same products reuses them too.
+"""
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+
+from google.genai import types
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from app.config import settings
+from app.services.result_cache import file_digest
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    path: str
+    digest: str  # sha256 of the original file, used in cache keys
+    payload_digest: str  # sha256 of ``data``, which changes with the preparation settings
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+
+    def as_part(self) -> types.Part:
+        return types.Part.from_bytes(data=self.data, mime_type=self.mime_type)
+
+
+_memo: OrderedDict[tuple, PreparedImage] = OrderedDict()
+_memo_lock = Lock()
+
+
+def _encode(path: str, max_side: int) -> PreparedImage:
+    with PILImage.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side), PILImage.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        if has_alpha:
+            img.save(buffer, format="PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            img.convert("RGB").save(
+                buffer, format="JPEG", quality=settings.REFERENCE_IMAGE_QUALITY, optimize=True
+            )
+            mime_type = "image/jpeg"
+        size = img.size
+
+    return PreparedImage(
+        path=path,
+        digest=file_digest(path),
+        payload_digest=hashlib.sha256(buffer.getvalue()).hexdigest(),
+        data=buffer.getvalue(),
+        mime_type=mime_type,
+        width=size[0],
+        height=size[1],
+    )
+
+
+def prepare_image(path: str) -> PreparedImage:
+    """Decode, orient, downsize and encode one image (blocking; memoized)."""
+    stat = os.stat(path)
+    key = (
+        path,
+        stat.st_mtime_ns,
+        stat.st_size,
+        settings.REFERENCE_IMAGE_MAX_SIDE,
+        settings.REFERENCE_IMAGE_QUALITY,
+    )
+    with _memo_lock:
+        prepared = _memo.get(key)
+        if prepared is not None:
+            _memo.move_to_end(key)
+            return prepared
+
+    prepared = _encode(path, settings.REFERENCE_IMAGE_MAX_SIDE)
+    with _memo_lock:
+        _memo[key] = prepared
+        while len(_memo) > settings.REFERENCE_IMAGE_MEMO_SIZE:
+            _memo.popitem(last=False)
+    return prepared
+
+
+def prepare_images(paths: list[str]) -> list[PreparedImage]:
+    return [prepare_image(path) for path in paths]
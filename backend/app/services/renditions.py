@@ -0,0 +1,155 @@
+"""Downsized, modern-format copies of uploaded, downloaded and generated images.
+
+Every image gets one rendition per RENDITION_SIZES entry ("thumb", "medium",
+"full") in each RENDITION_FORMATS format Pillow can encode (WebP, AVIF).
+Encoding is CPU-bound, so it runs in a process pool off the event loop and
+off the generation's critical path. The results are stored as blobs and
+recorded as JSON on the row, ``{"thumb": {"webp": "blobs/…"}, …}``; the API
+turns the paths into /files URLs and clients fall back to ``stored_path``
+until renditions exist.
+"""
+import asyncio
+import functools
+import io
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image as PILImage
+from PIL import ImageOps, features
+from sqlmodel import Session
+
+from app.config import settings
+from app.database import engine
+from app.services.storage import local_path, release_blob, save_bytes
+
+logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+_tasks: set[asyncio.Task] = set()
+_stats = {"images": 0, "renditions": 0, "failures": 0}
+
+
+def _render(
+    path: str,
+    sizes: dict[str, int],
+    formats: list[str],
+    quality: int,
+) -> list[tuple[str, str, bytes]]:
+    """Encode every (size, format) rendition of one image (runs in a worker process)."""
+    renditions = []
+    with PILImage.open(path) as source:
+        source = ImageOps.exif_transpose(source)
+        mode = "RGBA" if source.mode in ("RGBA", "LA", "P") else "RGB"
+        source = source.convert(mode)
+        for name, max_side in sizes.items():
+            img = source.copy()
+            if max_side:
+                img.thumbnail((max_side, max_side), PILImage.Resampling.LANCZOS)
+            for fmt in formats:
+                buffer = io.BytesIO()
+                img.save(buffer, format=fmt.upper(), quality=quality)
+                renditions.append((name, fmt, buffer.getvalue()))
+    return renditions
+
+
+@functools.cache
+def _formats() -> list[str]:
+    available = [fmt for fmt in settings.RENDITION_FORMATS if features.check(fmt)]
+    if len(available) < len(settings.RENDITION_FORMATS):
+        missing = set(settings.RENDITION_FORMATS) - set(available)
+        logger.warning(f"Pillow cannot encode {sorted(missing)}; skipping those renditions")
+    return available
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs threads and an event loop is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, settings.RENDITION_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def render_renditions(stored_path: str) -> str | None:
+    """Create and store the renditions of one file; returns the JSON to record."""
+    formats = _formats()
+    if not settings.RENDITIONS_ENABLED or not formats:
+        return None
+    try:
+        path = await asyncio.to_thread(local_path, stored_path)
+        encoded = await asyncio.get_running_loop().run_in_executor(
+            _get_pool(),
+            _render,
+            path,
+            dict(settings.RENDITION_SIZES),
+            formats,
+            settings.RENDITION_QUALITY,
+        )
+    except Exception as e:
+        _stats["failures"] += 1
+        logger.warning(f"Rendering {stored_path} failed: {e}")
+        return None
+
+    renditions: dict[str, dict[str, str]] = {}
+    for name, fmt, data in encoded:
+        path = await asyncio.to_thread(save_bytes, data, f"{name}.{fmt}")
+        renditions.setdefault(name, {})[fmt] = path
+    _stats["images"] += 1
+    _stats["renditions"] += len(encoded)
+    return json.dumps(renditions)
+
+
+def rendition_paths(renditions: str | None) -> list[str]:
+    """Stored paths in a ``renditions`` column value."""
+    if not renditions:
+        return []
+    return [path for formats in json.loads(renditions).values() for path in formats.values()]
+
+
+def _record(model, row_id: int, renditions: str) -> None:
+    with Session(engine) as session:
+        row = session.get(model, row_id)
+        if row is None:
+            released = renditions
+        else:
+            released, row.renditions = row.renditions, renditions
+            session.add(row)
+            session.commit()
+    for path in rendition_paths(released):
+        release_blob(path)
+
+
+async def _render_and_record(model, row_id: int, stored_path: str) -> None:
+    renditions = await render_renditions(stored_path)
+    if renditions:
+        await asyncio.to_thread(_record, model, row_id, renditions)
+
+
+def schedule_renditions(model, row_id: int, stored_path: str) -> None:
+    """Render in the background and record the result on ``model`` row ``row_id``.
+
+    ``model`` is Image or GenerationResult (both have a ``renditions`` column).
+    """
+    if not settings.RENDITIONS_ENABLED:
+        return
+    task = asyncio.create_task(_render_and_record(model, row_id, stored_path))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def shutdown_renditions() -> None:
+    """Let queued renditions finish, then stop the pool (called at shutdown)."""
+    global _pool
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def rendition_stats() -> dict:
+    return {**_stats, "pending": len(_tasks)}
@@ -0,0 +1,138 @@
+"""Persistent, content-addressed cache for model outputs.
+
+Entries live in the ``cacheentry`` table, grouped by namespace (e.g.
+"analysis"). Keys are sha256 digests of everything the output depends on,
+including a prompt version, so changing a prompt never serves stale output.
+Each namespace has a TTL and is trimmed to CACHE_MAX_ENTRIES by least recent
+use. An entry may carry a tag (e.g. "target:3") so every entry derived from
+one record can be dropped when that record changes. Placeholder outputs of
+the local batch-prediction backend are never stored.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlmodel import Session, col, delete, select
+
+from app.config import settings
+from app.database import engine
+from app.models.db import CacheEntry
+from app.services.batch_prediction import returns_placeholders
+from app.services.storage import blob_digest
+
+logger = logging.getLogger(__name__)
+
+_stats: dict[str, dict[str, int]] = {}
+
+
+def _count(namespace: str, event: str) -> None:
+    counts = _stats.setdefault(namespace, {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "placeholders_skipped": 0})
+    counts[event] += 1
+
+
+def cache_key(*parts) -> str:
+    """Stable digest of JSON-serializable parts (dict keys are sorted)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    # Blob files are named by their digest already
+    known = blob_digest(path)
+    if known is not None:
+        return known
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_text(text: str | None) -> str:
+    """Collapse whitespace within lines so trivially re-typed text matches."""
+    if not text:
+        return ""
+    return "\n".join(" ".join(line.split()) for line in text.strip().splitlines())
+
+
+def prompt_version(*prompts: str) -> str:
+    """Short digest of prompt templates, to fold into cache keys."""
+    return hashlib.sha256("\x00".join(prompts).encode()).hexdigest()[:12]
+
+
+def _ttl(namespace: str) -> float:
+    return settings.CACHE_TTL_SECONDS.get(namespace, settings.CACHE_DEFAULT_TTL_SECONDS)
+
+
+def cache_get(namespace: str, key: str) -> str | None:
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        entry = session.exec(
+            select(CacheEntry).where(CacheEntry.namespace == namespace, CacheEntry.key == key)
+        ).first()
+        if entry is None:
+            _count(namespace, "misses")
+            return None
+        if entry.created_at < now - timedelta(seconds=_ttl(namespace)):
+            session.delete(entry)
+            session.commit()
+            _count(namespace, "misses")
+            return None
+
+        entry.hits += 1
+        entry.last_used_at = now
+        session.add(entry)
+        session.commit()
+        _count(namespace, "hits")
+        return entry.value
+
+
+def cache_put(namespace: str, key: str, value: str, tag: str | None = None) -> None:
+    if returns_placeholders():
+        _count(namespace, "placeholders_skipped")
+        return
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        entry = session.exec(
+            select(CacheEntry).where(CacheEntry.namespace == namespace, CacheEntry.key == key)
+        ).first()
+        if entry is None:
+            entry = CacheEntry(namespace=namespace, key=key, value=value)
+        entry.value = value
+        entry.tag = tag
+        entry.created_at = now
+        entry.last_used_at = now
+        session.add(entry)
+        session.commit()
+        _count(namespace, "writes")
+
+        # Least recently used entries beyond the namespace limit
+        stale = session.exec(
+            select(CacheEntry.id)
+            .where(CacheEntry.namespace == namespace)
+            .order_by(col(CacheEntry.last_used_at).desc())
+            .offset(settings.CACHE_MAX_ENTRIES)
+        ).all()
+        if stale:
+            session.exec(delete(CacheEntry).where(col(CacheEntry.id).in_(stale)))
+            session.commit()
+            _stats[namespace]["evictions"] += len(stale)
+
+
+def cache_invalidate(namespace: str, key: str | None = None, tag: str | None = None) -> int:
+    """Drop entries of a namespace by key and/or tag; the whole namespace if neither."""
+    with Session(engine) as session:
+        statement = delete(CacheEntry).where(CacheEntry.namespace == namespace)
+        if key is not None:
+            statement = statement.where(CacheEntry.key == key)
+        if tag is not None:
+            statement = statement.where(CacheEntry.tag == tag)
+        removed = session.exec(statement).rowcount
+        session.commit()
+        return removed
+
+
+def cache_stats() -> dict:
+    return {namespace: dict(counts) for namespace, counts in _stats.items()}
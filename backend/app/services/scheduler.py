@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import settings
+from app.services.batch_prediction import use_batch_prediction
+from app.services.priority import FairGate
+
+logger = logging.getLogger(__name__)
+
+
+class StageSkipped(Exception):
+    """Raised for a stage whose upstream stage failed."""
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    deps: tuple[str, ...] = ()
+    pool: str | None = None  # worker pool the stage runs in, e.g. "pro" / "image"
+    run_on_failed_deps: bool = False
+
+
+# Process-wide worker pools, one per model family. Stages from every running
+# generation share them, so e.g. Flash image calls keep flowing while Pro
+# text calls for other targets wait on their own pool. Free slots go to
+# waiting stages by priority class (see app.services.priority).
+_pools: dict[str, FairGate] = {}
+
+
+def _pool_size(name: str) -> int:
+    return max(1, settings.STAGE_POOL_SIZES.get(name, settings.STAGE_POOL_DEFAULT_SIZE))
+
+
+def _pool_slot(name: str):
+    pool = _pools.get(name)
+    if pool is None:
+        pool = _pools[name] = FairGate(_pool_size(name))
+    return pool.slot()
+
+
+def pool_stats() -> dict:
+    return {
+        name: {
+            "size": pool.size,
+            "in_use": pool.in_use,
+            "waiting": sum(pool.waiting().values()),
+            "waiting_by_priority": pool.waiting(),
+        }
+        for name, pool in _pools.items()
+    }
+
+
+class StageGraph:
+    """A small dependency graph of async stages.
+
+    Each stage starts as soon as all of its dependencies have finished and a
+    slot is free in its pool (and in the graph-wide ``limit``, if given).
+    Stages whose dependencies failed are skipped, unless they opt in with
+    ``run_on_failed_deps`` (e.g. a batch step that handles partial results).
+    """
+
+    def __init__(self, limit: int | None = None):
+        self._stages: dict[str, Stage] = {}
+        self._limit = asyncio.Semaphore(limit) if limit else None
+
+    def add(
+        self,
+        name: str,
+        run: Callable[[], Awaitable[Any]],
+        deps: tuple[str, ...] | list[str] = (),
+        pool: str | None = None,
+        run_on_failed_deps: bool = False,
+    ) -> None:
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self._stages[name] = Stage(name, run, tuple(deps), pool, run_on_failed_deps)
+
+    def _check(self) -> None:
+        for stage in self._stages.values():
+            for dep in stage.deps:
+                if dep not in self._stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dep}")
+
+        visiting: set[str] = set()
+        done: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in stage graph at {name}")
+            visiting.add(name)
+            for dep in self._stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self._stages:
+            visit(name)
+
+    async def run(self) -> dict[str, BaseException | None]:
+        """Run every stage; returns each stage's exception (None on success)."""
+        self._check()
+        finished = {name: asyncio.Event() for name in self._stages}
+        outcomes: dict[str, BaseException | None] = {}
+
+        async def run_stage(stage: Stage) -> None:
+            try:
+                for dep in stage.deps:
+                    await finished[dep].wait()
+                failed = [dep for dep in stage.deps if outcomes[dep] is not None]
+                if failed and not stage.run_on_failed_deps:
+                    raise StageSkipped(f"{stage.name} skipped: {', '.join(failed)} failed")
+
+                async with AsyncExitStack() as stack:
+                    # Take the per-graph slot first so a generation waiting on
+                    # its own limit never sits on a shared pool slot
+                    if self._limit and stage.pool:
+                        await stack.enter_async_context(self._limit)
+                    # Batched calls wait hours for their job; they must not
+                    # hold pool slots that online work needs
+                    if stage.pool and not use_batch_prediction():
+                        await stack.enter_async_context(_pool_slot(stage.pool))
+                    await stage.run()
+                outcomes[stage.name] = None
+            except asyncio.CancelledError:
+                outcomes[stage.name] = asyncio.CancelledError()
+                raise
+            except Exception as e:
+                if not isinstance(e, StageSkipped):
+                    logger.error(f"Stage {stage.name} failed: {e}")
+                outcomes[stage.name] = e
+            finally:
+                finished[stage.name].set()
+
+        await asyncio.gather(*(run_stage(stage) for stage in self._stages.values()))
+        return outcomes
@@ -1,36 +1,295 @@
+"""File storage under UPLOAD_DIR.
+
+New files are content-addressed: a blob is named by the sha256 of its bytes
+(``blobs/ab/abcdef….png``) and written once, however many uploads,
+downloads or generations produce the same bytes. The ``blob`` table counts
+the references to each digest: every save hands out one, a row that copies
+another row's path takes one with ``retain_blob``, and ``release_blob``
+drops one when a path is replaced or discarded, deleting the file with the
+last. Callers keep working with plain
+``stored_path`` strings, and paths written before blobs existed (e.g.
+``originals/<uuid>.png``) still resolve.
+
+Uploads are written to a temporary file as they arrive from the client,
+hashed and size-checked on the way, and renamed into place once complete.
+
+New blobs are also put in the configured object storage backend (see
+services/object_storage.py) before they become visible locally, so a local
+copy implies a stored object. Code that reads a file goes through
+``local_path``, which fetches it from the backend when this host has no copy.
+"""
+import asyncio
+import hashlib
+import mimetypes
 import os
+import re
 import uuid
+from collections.abc import AsyncIterable
 from pathlib import Path
 
-from fastapi import UploadFile
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, delete, update
 
 from app.config import settings
+from app.database import engine
+from app.models.db import Blob
+from app.services.object_storage import get_storage_backend
+
+BLOB_DIR = "blobs"
+_BLOB_PATH = re.compile(rf"(?:^|/){BLOB_DIR}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(?:\.\w+)?$")
+
+_stats = {
+    "writes": 0,
+    "dedup_hits": 0,
+    "bytes_written": 0,
+    "bytes_deduplicated": 0,
+    "fetched": 0,  # local copies downloaded from a remote backend
+}
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Leading bytes of the image formats accepted for upload
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"GIF87a", "image/gif", ".gif"),
+    (b"GIF89a", "image/gif", ".gif"),
+    (b"BM", "image/bmp", ".bmp"),
+)
+# ISO-BMFF brands (bytes 8-12, after "ftyp")
+_FTYP_BRANDS = {
+    b"avif": ("image/avif", ".avif"),
+    b"avis": ("image/avif", ".avif"),
+    b"heic": ("image/heic", ".heic"),
+    b"heix": ("image/heic", ".heic"),
+    b"mif1": ("image/heif", ".heif"),
+}
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UnsupportedFileType(ValueError):
+    pass
+
+
+def sniff_image_type(head: bytes) -> tuple[str, str] | None:
+    """(mime type, extension) of an image from its first bytes, or None."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    if head[4:8] == b"ftyp" and head[8:12] in _FTYP_BRANDS:
+        return _FTYP_BRANDS[head[8:12]]
+    for signature, mime_type, ext in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type, ext
+    return None
+
+
+def _extension(filename: str | None) -> str:
+    suffix = Path(filename).suffix.lower() if filename else ""
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,8}", suffix) else ".bin"
+
+
+def _blob_path(digest: str, ext: str) -> str:
+    with Session(engine) as session:
+        blob = session.get(Blob, digest)
+    return f"{BLOB_DIR}/{digest[:2]}/{digest}{blob.ext if blob else ext}"
+
+
+def _put_blob(stored_path: str, dest: Path, tmp: Path | None, data: bytes | None) -> None:
+    """Move new content into place, putting it in a remote backend first."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if tmp is None:
+        tmp = dest.with_name(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+    backend = get_storage_backend()
+    try:
+        if backend.remote:
+            backend.put_file(stored_path, tmp, mimetypes.guess_type(stored_path)[0])
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, dest)
+
+
+def _commit_blob(
+    digest: str,
+    size: int,
+    stored_path: str,
+    tmp: Path | None,
+    data: bytes | None,
+) -> None:
+    """Store new content (unless the blob exists) and count the reference."""
+    dest = Path(get_absolute_path(stored_path))
+    try:
+        existed = dest.stat().st_size == size
+    except FileNotFoundError:
+        existed = False
+    if not existed:
+        _put_blob(stored_path, dest, tmp, data)
+
+    with Session(engine) as session:
+        session.exec(
+            insert(Blob)
+            .values(sha256=digest, size_bytes=size, ext=Path(stored_path).suffix, refcount=1)
+            .on_conflict_do_update(
+                index_elements=["sha256"], set_={"refcount": Blob.refcount + 1}
+            )
+        )
+        session.commit()
+
+    # release_blob deletes files before its commit, so once the reference is
+    # counted a file that is still here stays; one released meanwhile is
+    # written again from the content still at hand
+    if existed and dest.exists():
+        if tmp is not None:
+            tmp.unlink(missing_ok=True)
+        _stats["dedup_hits"] += 1
+        _stats["bytes_deduplicated"] += size
+    else:
+        if existed:
+            _put_blob(stored_path, dest, tmp, data)
+        _stats["writes"] += 1
+        _stats["bytes_written"] += size
+
+
+def _store(data: bytes, filename: str | None) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    stored_path = _blob_path(digest, _extension(filename))
+    _commit_blob(digest, len(data), stored_path, None, data)
+    return stored_path
+
+
+async def save_upload(
+    chunks: AsyncIterable[bytes], max_bytes: int | None = None
+) -> tuple[str, int, str]:
+    """Stream an uploaded image into the blob store as its bytes arrive.
+
+    Returns (stored_path, size in bytes, sniffed mime type). Raises
+    UploadTooLarge once more than ``max_bytes`` (default MAX_UPLOAD_BYTES)
+    have arrived and UnsupportedFileType if the content is not an image;
+    either way the partial file is removed.
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    staging = Path(settings.UPLOAD_DIR) / BLOB_DIR
+    staging.mkdir(parents=True, exist_ok=True)
+    tmp = staging / f".{uuid.uuid4().hex}.tmp"
+
+    digest = hashlib.sha256()
+    size = 0
+    kind = None
+    pending = bytearray()  # network chunks are small; write in UPLOAD_CHUNK_SIZE pieces
+    try:
+        with tmp.open("wb") as out:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the {max_bytes} byte upload limit")
+                digest.update(chunk)
+                pending += chunk
+                if kind is None and len(pending) >= 32:
+                    kind = sniff_image_type(bytes(pending[:32]))
+                    if kind is None:
+                        raise UnsupportedFileType("File content is not a supported image")
+                if len(pending) >= UPLOAD_CHUNK_SIZE:
+                    await asyncio.to_thread(out.write, pending)
+                    pending = bytearray()
+            if kind is None and pending:
+                kind = sniff_image_type(bytes(pending))
+            if kind is None:
+                raise UnsupportedFileType("File is empty or not a supported image")
+            await asyncio.to_thread(out.write, pending)
+
+        mime_type, ext = kind
+        stored_path = await asyncio.to_thread(_blob_path, digest.hexdigest(), ext)
+        await asyncio.to_thread(_commit_blob, digest.hexdigest(), size, stored_path, tmp, None)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return stored_path, size, mime_type
+
+
+def save_bytes(data: bytes, filename: str) -> str:
+    return _store(data, filename)
+
+
+def blob_digest(stored_path: str) -> str | None:
+    """sha256 encoded in a blob path, so identical files compare without reading them."""
+    match = _BLOB_PATH.search(stored_path.replace(os.sep, "/"))
+    return match.group(1) if match else None
+
+
+def retain_blob(stored_path: str) -> None:
+    """Take one more reference to a blob, for a row that copies its path."""
+    digest = blob_digest(stored_path)
+    if digest is None:
+        return
+    with Session(engine) as session:
+        session.exec(
+            update(Blob).where(Blob.sha256 == digest).values(refcount=Blob.refcount + 1)
+        )
+        session.commit()
+
+
+def release_blob(stored_path: str) -> None:
+    """Drop one reference to a blob; the file is deleted with the last one."""
+    digest = blob_digest(stored_path)
+    if digest is None:
+        return
+    with Session(engine) as session:
+        session.exec(
+            update(Blob).where(Blob.sha256 == digest).values(refcount=Blob.refcount - 1)
+        )
+        deleted = session.exec(
+            delete(Blob).where(Blob.sha256 == digest, Blob.refcount <= 0)
+        ).rowcount
+        if deleted:
+            # Still inside the write transaction: a concurrent save of the same
+            # bytes counts its reference only after the file is gone, and then
+            # writes it again (see _commit_blob)
+            Path(get_absolute_path(stored_path)).unlink(missing_ok=True)
+            get_storage_backend().delete(stored_path)
+        session.commit()
 
 
-async def save_upload(file: UploadFile, subdir: str = "originals") -> tuple[str, int]:
-    upload_dir = Path(settings.UPLOAD_DIR) / subdir
-    upload_dir.mkdir(parents=True, exist_ok=True)
+def local_path(stored_path: str) -> str:
+    """Absolute path of a local copy of a stored file (blocking).
 
-    ext = Path(file.filename).suffix if file.filename else ".bin"
-    unique_name = f"{uuid.uuid4().hex}{ext}"
-    dest = upload_dir / unique_name
+    With a remote backend, a file this host has not seen yet is downloaded
+    into UPLOAD_DIR first. A file that exists nowhere yields its would-be
+    path, so callers fail the same way as for a missing local file.
+    """
+    path = Path(get_absolute_path(stored_path))
+    backend = get_storage_backend()
+    if backend.remote and not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        try:
+            if backend.get_file(stored_path, tmp):
+                os.replace(tmp, path)
+                _stats["fetched"] += 1
+        finally:
+            tmp.unlink(missing_ok=True)
+    return str(path)
 
-    content = await file.read()
-    dest.write_bytes(content)
 
-    stored_path = f"{subdir}/{unique_name}"
-    return stored_path, len(content)
+def file_exists(stored_path: str) -> bool:
+    if os.path.exists(get_absolute_path(stored_path)):
+        return True
+    backend = get_storage_backend()
+    return backend.remote and backend.exists(stored_path)
 
 
-def save_bytes(data: bytes, filename: str, subdir: str = "generated") -> str:
-    upload_dir = Path(settings.UPLOAD_DIR) / subdir
-    upload_dir.mkdir(parents=True, exist_ok=True)
+def presigned_url(stored_path: str) -> str | None:
+    """Direct download URL from the storage backend, if it offers one."""
+    return get_storage_backend().presigned_url(
+        stored_path, settings.PRESIGNED_URL_EXPIRES_SECONDS
+    )
 
-    unique_name = f"{uuid.uuid4().hex}_{filename}"
-    dest = upload_dir / unique_name
-    dest.write_bytes(data)
 
-    return f"{subdir}/{unique_name}"
+def blob_stats() -> dict:
+    return {**_stats, "backend": settings.STORAGE_BACKEND}
 
 
 def get_absolute_path(stored_path: str) -> str:
@@ -1,9 +1,19 @@
+import asyncio
 import json
 import logging
 
-from google import genai
+from google.genai import types
+from pydantic import BaseModel
 
-from app.config import settings
+from app.services.genai_client import generate_content
+from app.services.result_cache import (
+    cache_get,
+    cache_invalidate,
+    cache_key,
+    cache_put,
+    normalize_text,
+    prompt_version,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,53 +43,199 @@ ADAPT_PROMPT = """당신은 한국 뷰티 시장 전문 카피라이터입니다
 - X세대: 정중한 존댓말, 효능/결과 중심, 전문적 신뢰감 ("임상 테스트 완료", "피부과학")
 - 시니어: 쉬운 표현, 안전성 강조, 따뜻한 톤 ("순하게 케어", "피부과 전문의 추천")"""
 
+BATCH_ADAPT_PROMPT = """당신은 한국 뷰티 시장 전문 카피라이터입니다.
+원본 프로모션 이미지에서 추출된 텍스트를 아래 각 타겟에 맞게 재작성해주세요.
+이 텍스트는 AI 이미지 생성 모델이 이미지 안에 직접 렌더링합니다.
+
+원본 텍스트:
+{text_content}
+
+타겟 목록:
+{targets}
+
+규칙:
+1. 핵심 제품 정보와 메시지는 유지
+2. 타겟 세대의 어투, 용어, 감성에 맞게 변환
+3. 가능한 한 짧고 임팩트 있게 작성 (이미지 안에 렌더링되므로 긴 텍스트는 비효과적)
+4. 최대 15자 이내의 핵심 카피 1줄 권장 (보조 카피가 필요하면 최대 2줄)
+5. 한국어 텍스트는 한국어로, 영어 텍스트는 영어로 유지
+6. 각 타겟마다 target_id와 변환된 텍스트(text)만 반환 (따옴표, 설명 없이)
+
+세대별 카피 가이드:
+- Z세대: 줄임말/신조어 OK, 친근한 반말체, 감성적 표현 ("찐템", "갓성비", "~해버렸다")
+- 밀레니얼: 세련된 해요체, 성분/효능 강조, 라이프스타일 연결 ("데일리 루틴에 딱")
+- X세대: 정중한 존댓말, 효능/결과 중심, 전문적 신뢰감 ("임상 테스트 완료", "피부과학")
+- 시니어: 쉬운 표현, 안전성 강조, 따뜻한 톤 ("순하게 케어", "피부과 전문의 추천")"""
+
+
+ADAPT_MODEL = "gemini-3.1-pro-preview"
+
+# Single and batched adaptation write the same memo entries
+ADAPT_CACHE_VERSION = prompt_version(ADAPT_PROMPT, BATCH_ADAPT_PROMPT)
+
+
+class AdaptedCopy(BaseModel):
+    target_id: int
+    text: str
+
+
+def format_keywords(style_keywords: str) -> str:
+    """Target style keywords (stored as a JSON list) as a comma-separated string."""
+    try:
+        kw_list = json.loads(style_keywords)
+        return ", ".join(kw_list)
+    except (json.JSONDecodeError, TypeError):
+        return style_keywords
+
+
+def _clean(adapted: str) -> str:
+    adapted = adapted.strip()
+    # Remove surrounding quotes if Gemini added them
+    if (adapted.startswith('"') and adapted.endswith('"')) or \
+       (adapted.startswith("'") and adapted.endswith("'")):
+        adapted = adapted[1:-1]
+    return adapted
+
+
+def _memo_key(
+    text_content: str,
+    target_id: int,
+    name: str,
+    target_age: str,
+    style_keywords: str,
+) -> str:
+    # The target's own fields are part of the key, so an edited target never
+    # matches copy written for its old persona even before invalidation runs
+    target_digest = cache_key(name, target_age, style_keywords)
+    return cache_key(
+        ADAPT_CACHE_VERSION, normalize_text(text_content), target_id, target_digest, ADAPT_MODEL
+    )
+
+
+def _memo_tag(target_id: int) -> str:
+    return f"target:{target_id}"
+
+
+def invalidate_adapted_copy(target_id: int) -> int:
+    """Forget every memoized copy for a target (called when it is edited)."""
+    return cache_invalidate("adapted_copy", tag=_memo_tag(target_id))
+
 
 async def adapt_text(
     text_content: str,
     target_name: str,
     target_age: str,
     style_keywords: str,
+    target_id: int | None = None,
+    force_refresh: bool = False,
 ) -> str | None:
     """Adapt original image text for a specific target using Gemini.
 
     The adapted text is included in the Imagen prompt so the model
     attempts to render it in the generated image. It is also stored
     in the DB for display in the UI alongside the generated image.
+
+    With a ``target_id`` the result is memoized across generations, keyed on
+    the normalized text and the target's content; ``force_refresh`` skips
+    the lookup.
     """
     if not text_content or not text_content.strip():
         return None
 
-    client = genai.Client(
-        vertexai=True,
-        project=settings.GCP_PROJECT_ID,
-        location=settings.GCP_LOCATION,
-    )
-
-    try:
-        kw_list = json.loads(style_keywords)
-        kw_str = ", ".join(kw_list)
-    except (json.JSONDecodeError, TypeError):
-        kw_str = style_keywords
+    key = None
+    if target_id is not None:
+        key = _memo_key(text_content, target_id, target_name, target_age, style_keywords)
+        if not force_refresh:
+            cached = await asyncio.to_thread(cache_get, "adapted_copy", key)
+            if cached is not None:
+                return cached
 
     prompt = ADAPT_PROMPT.format(
         text_content=text_content,
         target_name=target_name,
         target_age=target_age,
-        style_keywords=kw_str,
+        style_keywords=format_keywords(style_keywords),
     )
 
     try:
-        response = client.models.generate_content(
-            model="gemini-3.1-pro-preview",
+        response = await generate_content(
+            model=ADAPT_MODEL,
             contents=[prompt],
         )
-        adapted = response.text.strip()
-        # Remove surrounding quotes if Gemini added them
-        if (adapted.startswith('"') and adapted.endswith('"')) or \
-           (adapted.startswith("'") and adapted.endswith("'")):
-            adapted = adapted[1:-1]
+        adapted = _clean(response.text)
         logger.info(f"Adapted text for {target_name}: {adapted[:100]}...")
+        if key is not None and adapted:
+            await asyncio.to_thread(
+                cache_put, "adapted_copy", key, adapted, tag=_memo_tag(target_id)
+            )
         return adapted
     except Exception as e:
         logger.error(f"Text adaptation failed for {target_name}: {e}")
         return None
+
+
+async def adapt_text_batch(
+    text_content: str,
+    targets: list[dict],
+    force_refresh: bool = False,
+) -> dict[int, str]:
+    """Adapt the text for several targets in a single structured Gemini call.
+
+    ``targets`` holds dicts with ``id``, ``name``, ``target_age`` and
+    ``style_keywords``. Returns ``{target_id: adapted_text}`` for the targets
+    present in the response; callers fall back to :func:`adapt_text` for
+    any target that is missing. Memoized targets are answered without
+    being sent.
+    """
+    if not text_content or not text_content.strip() or not targets:
+        return {}
+
+    keys = {
+        t["id"]: _memo_key(text_content, t["id"], t["name"], t["target_age"], t["style_keywords"])
+        for t in targets
+    }
+    adapted: dict[int, str] = {}
+    if not force_refresh:
+        for t in targets:
+            cached = await asyncio.to_thread(cache_get, "adapted_copy", keys[t["id"]])
+            if cached is not None:
+                adapted[t["id"]] = cached
+        targets = [t for t in targets if t["id"] not in adapted]
+        if not targets:
+            return adapted
+
+    target_lines = "\n".join(
+        f"- target_id {t['id']}: {t['name']} / 연령대 {t['target_age']} / "
+        f"스타일 키워드 {format_keywords(t['style_keywords'])}"
+        for t in targets
+    )
+    prompt = BATCH_ADAPT_PROMPT.format(text_content=text_content, targets=target_lines)
+
+    try:
+        response = await generate_content(
+            model=ADAPT_MODEL,
+            contents=[prompt],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=list[AdaptedCopy],
+            ),
+        )
+        items = response.parsed
+        if items is None:
+            items = [AdaptedCopy(**item) for item in json.loads(response.text)]
+    except Exception as e:
+        logger.error(f"Batched text adaptation failed: {e}")
+        return adapted
+
+    wanted = {t["id"] for t in targets}
+    returned = 0
+    for item in items:
+        text = _clean(item.text)
+        if item.target_id in wanted and text:
+            adapted[item.target_id] = text
+            returned += 1
+            await asyncio.to_thread(
+                cache_put, "adapted_copy", keys[item.target_id], text, tag=_memo_tag(item.target_id)
+            )
+    logger.info(f"Batched adaptation returned {returned}/{len(targets)} targets")
+    return adapted
@@ -0,0 +1,212 @@
+"""Standalone generation worker.
+
+Run one or more of these next to the API (``EMBEDDED_WORKER=false``) to
+process queued generations out of process:
+
+    python -m app.worker --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import uuid
+
+from sqlmodel import Session
+
+from app.config import settings
+from app.database import create_db_and_tables, engine, migrate_db
+from app.models.db import Generation
+from app.services.genai_client import close_clients, init_clients
+from app.services.http_client import close_http_client
+from app.services.renditions import shutdown_renditions
+from app.services.job_queue import get_job_queue
+from app.services.pipeline import cancel_generation, run_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_generation(payload: dict) -> None:
+    await run_pipeline(payload["generation_id"])
+
+
+JOB_HANDLERS = {
+    "generation": _run_generation,
+}
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def _heartbeat(job_id: int, worker_id: str, task: asyncio.Task) -> None:
+    queue = get_job_queue()
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        alive = await asyncio.to_thread(queue.heartbeat, job_id, worker_id)
+        if not alive:
+            logger.warning(f"Lost lease on job {job_id}; stopping it")
+            task.cancel()
+            return
+
+
+def _is_cancelled(generation_id: int) -> bool:
+    with Session(engine) as session:
+        generation = session.get(Generation, generation_id)
+        return generation is not None and generation.status == "cancelled"
+
+
+async def _watch_cancellation(generation_id: int, task: asyncio.Task) -> bool:
+    """Cancel ``task`` once its generation is cancelled through the API."""
+    while True:
+        await asyncio.sleep(settings.CANCEL_POLL_SECONDS)
+        if await asyncio.to_thread(_is_cancelled, generation_id):
+            logger.info(f"Generation {generation_id} was cancelled; stopping its job")
+            task.cancel()
+            return True
+
+
+async def _process(
+    job_id: int,
+    kind: str,
+    payload: dict,
+    worker_id: str,
+    generation_id: int | None = None,
+) -> None:
+    queue = get_job_queue()
+    handler = JOB_HANDLERS.get(kind)
+    if handler is None:
+        await asyncio.to_thread(queue.fail, job_id, worker_id, f"Unknown job kind: {kind}")
+        return
+
+    task = asyncio.create_task(handler(payload))
+    watchers = [asyncio.create_task(_heartbeat(job_id, worker_id, task))]
+    if generation_id is not None:
+        watchers.append(asyncio.create_task(_watch_cancellation(generation_id, task)))
+    try:
+        await task
+    except asyncio.CancelledError:
+        if not task.cancelled():
+            raise
+        cancel_watcher = watchers[-1] if generation_id is not None else None
+        if cancel_watcher and cancel_watcher.done() and not cancel_watcher.cancelled():
+            # Stages that were mid-write may have overwritten the cancelled
+            # statuses; apply them again now that nothing is running
+            await asyncio.to_thread(cancel_generation, generation_id)
+            await asyncio.to_thread(queue.cancel, job_id, worker_id)
+        return
+    except Exception as e:
+        logger.error(f"Job {job_id} ({kind}) failed: {e}")
+        await asyncio.to_thread(queue.fail, job_id, worker_id, str(e))
+        return
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+
+    await asyncio.to_thread(queue.complete, job_id, worker_id)
+
+
+async def _claim_loop(
+    stop: asyncio.Event,
+    worker_id: str,
+    concurrency: int,
+    priorities: list[str] | None,
+    running: set[asyncio.Task],
+) -> None:
+    """Claim jobs of the ``priorities`` classes (all if None), ``concurrency`` at a time."""
+    queue = get_job_queue()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    while not stop.is_set():
+        await slots.acquire()
+        job = await asyncio.to_thread(queue.claim, worker_id, priorities)
+        if job is None:
+            slots.release()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        logger.info(f"Worker {worker_id} claimed job {job.id} ({job.kind}, {job.priority})")
+        task = asyncio.create_task(
+            _process(job.id, job.kind, json.loads(job.payload), worker_id, job.generation_id)
+        )
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: slots.release())
+
+
+async def run_worker(
+    stop: asyncio.Event,
+    concurrency: int | None = None,
+    worker_id: str | None = None,
+) -> None:
+    """Claim and run jobs until ``stop`` is set, up to ``concurrency`` at a time.
+
+    In batch mode (BULK_EXECUTION_MODE=batch) bulk jobs spend most of their
+    time parked on batch-prediction results, so they are claimed separately,
+    up to BATCH_WORKER_CONCURRENCY at a time, and never take the slots that
+    interactive jobs need. The more of them wait at once, the more
+    generations each batch job collects.
+    """
+    worker_id = worker_id or make_worker_id()
+    concurrency = concurrency or settings.WORKER_CONCURRENCY
+    running: set[asyncio.Task] = set()
+    if settings.BULK_EXECUTION_MODE == "batch":
+        interactive = [p for p in settings.PRIORITY_WEIGHTS if p != "bulk"]
+        loops = [
+            _claim_loop(stop, worker_id, concurrency, interactive, running),
+            _claim_loop(stop, worker_id, settings.BATCH_WORKER_CONCURRENCY, ["bulk"], running),
+        ]
+    else:
+        loops = [_claim_loop(stop, worker_id, concurrency, None, running)]
+    logger.info(f"Worker {worker_id} started")
+
+    try:
+        await asyncio.gather(*loops)
+    finally:
+        # Unfinished jobs keep their lease and are picked up again once it expires
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        logger.info(f"Worker {worker_id} stopped")
+
+
+async def _main(concurrency: int | None) -> None:
+    migrate_db()
+    create_db_and_tables()
+    init_clients()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await run_worker(stop, concurrency=concurrency)
+    finally:
+        await close_clients()
+        await close_http_client()
+        await shutdown_renditions()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fit-Promo generation worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="jobs to run at once (default: WORKER_CONCURRENCY)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    asyncio.run(_main(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Compare /files throughput of plain StaticFiles and app.api.files.FileServer.
+
+Both are served by uvicorn on local ports from a temporary upload dir holding
+one generated-size image stored as a blob. Each scenario runs concurrent
+clients for a fixed time:
+
+- ``cold``: full downloads, as on a first view;
+- ``repeat``: a browser re-showing an image it has cached. FileServer's
+  ``immutable`` blobs are not requested again at all, so only StaticFiles
+  is measured (If-None-Match revalidations answered with 304);
+- ``range``: 256 KiB Range requests, as used for progressive loading.
+
+Usage (from backend/):
+
+    python -m benchmarks.serve_files [--seconds 5] [--concurrency 32] [--size-mb 4]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(app: FastAPI) -> tuple[uvicorn.Server, str]:
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def _run(url: str, headers: dict, seconds: float, concurrency: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    requests = 0
+    received = 0
+    statuses: set[int] = set()
+    deadline = time.perf_counter() + seconds
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+
+        async def worker() -> None:
+            nonlocal requests, received
+            while time.perf_counter() < deadline:
+                response = await client.get(url, headers=headers)
+                requests += 1
+                received += len(response.content)
+                statuses.add(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "req/s": requests / elapsed,
+        "MiB/s": received / elapsed / (1 << 20),
+        "status": ",".join(map(str, sorted(statuses))),
+    }
+
+
+async def main(seconds: float, concurrency: int, size_mb: float) -> None:
+    upload_dir = tempfile.mkdtemp(prefix="serve-files-bench-")
+    os.environ["UPLOAD_DIR"] = upload_dir
+    os.environ["DATABASE_URL"] = f"sqlite:///{upload_dir}/bench.db"
+    # Imported after the environment is set so the blob lands in the temporary dir
+    from app.api.files import FileServer
+    from app.database import create_db_and_tables
+    from app.services.storage import save_bytes
+
+    create_db_and_tables()
+    stored_path = save_bytes(os.urandom(int(size_mb * (1 << 20))), "bench.png")
+
+    servers = {}
+    for name, files in (
+        ("StaticFiles", StaticFiles(directory=upload_dir)),
+        ("FileServer", FileServer(directory=upload_dir)),
+    ):
+        app = FastAPI()
+        app.mount("/files", files)
+        servers[name] = _serve(app)
+
+    print(f"{size_mb:g} MiB file, {concurrency} clients, {seconds:g}s per scenario\n")
+    print(f"{'scenario':<8} {'server':<12} {'req/s':>10} {'MiB/s':>10}  status")
+    for scenario in ("cold", "repeat", "range"):
+        for name, (_, base) in servers.items():
+            url = f"{base}/files/{stored_path}"
+            first = httpx.get(url)
+            if scenario == "repeat":
+                if "immutable" in first.headers.get("cache-control", ""):
+                    print(f"{scenario:<8} {name:<12} {'(served from browser cache, no request)':>40}")
+                    continue
+                headers = {"if-none-match": first.headers["etag"]}
+            elif scenario == "range":
+                headers = {"range": "bytes=0-262143"}
+            else:
+                headers = {}
+            result = await _run(url, headers, seconds, concurrency)
+            print(
+                f"{scenario:<8} {name:<12} {result['req/s']:>10.1f} {result['MiB/s']:>10.1f}"
+                f"  {result['status']}"
+            )
+
+    for server, _ in servers.values():
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--size-mb", type=float, default=4.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.concurrency, args.size_mb))
@@ -0,0 +1,16 @@
+"""Test settings: a throwaway database and upload dir, and no outbound work at startup.
+
+The environment is set before ``app`` is imported, since app.config reads it
+once at import time.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="fitpromo-test-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_tmp}/test.db",
+    UPLOAD_DIR=os.path.join(_tmp, "uploads"),
+    PRODUCT_IMAGE_PREFETCH="false",
+    RENDITIONS_ENABLED="false",
+    JOB_POLL_INTERVAL="0.05",
+)
@@ -0,0 +1,59 @@
+"""A slow Gemini call must not hold up the event loop that serves the API."""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import genai_client
+
+MODEL_DELAY = 3.0
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    """Every Gemini client answers after MODEL_DELAY seconds of awaiting."""
+    started = threading.Event()
+
+    async def generate_content(model, contents, config=None):
+        started.set()
+        await asyncio.sleep(MODEL_DELAY)
+        return SimpleNamespace(text='{"text_content": ""}', parsed=None)
+
+    async def aclose():
+        pass
+
+    def create_client(project, location):
+        return SimpleNamespace(
+            aio=SimpleNamespace(
+                models=SimpleNamespace(generate_content=generate_content), aclose=aclose
+            ),
+            close=lambda: None,
+        )
+
+    monkeypatch.setattr(genai_client, "_create_client", create_client)
+    monkeypatch.setattr(genai_client, "_clients", {})
+    return started
+
+
+def test_slow_model_call_does_not_block_other_requests(slow_model):
+    from app.main import app
+
+    with TestClient(app) as client:
+        target_ids = [t["id"] for t in client.get("/api/v1/targets").json()]
+        response = client.post(
+            "/api/v1/generations",
+            json={"promotion_prompt": "봄맞이 러닝화 할인", "target_ids": target_ids[:1]},
+        )
+        assert response.status_code == 200
+
+        # The embedded worker picks the generation up and awaits the model
+        assert slow_model.wait(timeout=10)
+        started = time.perf_counter()
+        health = client.get("/health")
+        elapsed = time.perf_counter() - started
+
+    assert health.status_code == 200
+    assert elapsed < MODEL_DELAY / 10
@@ -0,0 +1,103 @@
+"""Uploads are stored as they stream in, and oversized ones are cut off early."""
+import asyncio
+import hashlib
+import io
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from starlette.requests import Request
+
+from app.api.uploads import stream_upload
+from app.config import settings
+from app.services import genai_client
+from app.services.storage import UploadTooLarge, save_upload
+
+LIMIT = 100_000
+BOUNDARY = "upload-test-boundary"
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 140)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _multipart(data: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="a.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", LIMIT)
+    # Uploads make no model calls; skip the credential lookup at startup
+    async def aclose():
+        pass
+
+    def create_client(project, location):
+        return SimpleNamespace(aio=SimpleNamespace(aclose=aclose), close=lambda: None)
+
+    monkeypatch.setattr(genai_client, "_create_client", create_client)
+    monkeypatch.setattr(genai_client, "_clients", {})
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def _temp_files() -> list[Path]:
+    return list(Path(settings.UPLOAD_DIR).rglob("*.tmp"))
+
+
+def test_upload_is_stored_by_content(client):
+    data = _png()
+    response = client.post("/api/v1/images/upload", files={"file": ("a.png", data, "image/png")})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert hashlib.sha256(data).hexdigest() in body["stored_path"]
+    assert body["size_bytes"] == len(data)
+    assert body["mime_type"] == "image/png"
+
+
+def test_oversized_upload_is_rejected(client):
+    data = _png() + bytes(LIMIT)
+    response = client.post("/api/v1/images/upload", files={"file": ("a.png", data, "image/png")})
+
+    assert response.status_code == 413
+    assert _temp_files() == []
+
+
+def test_oversized_body_is_not_read_to_the_end():
+    body = _multipart(_png() + bytes(50 * LIMIT))
+    pieces = [body[i : i + 65536] for i in range(0, len(body), 65536)]
+    read = 0
+
+    async def receive():
+        nonlocal read
+        piece = pieces[read] if read < len(pieces) else b""
+        read += 1
+        return {"type": "http.request", "body": piece, "more_body": read < len(pieces)}
+
+    # No Content-Length, as with a chunked request
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())],
+    }
+
+    async def upload():
+        streamed = await stream_upload(Request(scope, receive), "file", LIMIT)
+        await save_upload(streamed.chunks, LIMIT)
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(upload())
+    assert read * 65536 < 2 * LIMIT
+    assert _temp_files() == []
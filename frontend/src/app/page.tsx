@@ -16,7 +16,8 @@ import {
   getTargets,
   createGeneration,
   getGeneration,
-  getImageUrl,
+  cancelGeneration,
+  getRenditionUrl,
 } from "@/lib/api";
 import type {
   ImageFile,
@@ -29,6 +30,9 @@ import { toast } from "sonner";
 
 type ViewMode = "form" | "result";
 
+const FINAL_STATUSES: Generation["status"][] = ["completed", "failed", "cancelled"];
+const RENDITION_POLLS = 10; // extra polls (3s apart) after the generation finishes
+
 export default function HomePage() {
   const [view, setView] = useState<ViewMode>("form");
   const [promotionPrompt, setPromotionPrompt] = useState("");
@@ -44,7 +48,8 @@ export default function HomePage() {
   const isActive =
     generation &&
     generation.status !== "completed" &&
-    generation.status !== "failed";
+    generation.status !== "failed" &&
+    generation.status !== "cancelled";
 
   const canGenerate =
     (promotionPrompt.trim() || uploadedImage) && selectedTargets.length > 0;
@@ -93,14 +98,33 @@ export default function HomePage() {
     return getGeneration(generation.id);
   }, [generation]);
 
+  // Renditions are rendered in the background and often land after the
+  // generation has finished; keep polling a little longer until they do
+  const [renditionPolls, setRenditionPolls] = useState(0);
+  const awaitingRenditions =
+    !!generation &&
+    !isActive &&
+    renditionPolls < RENDITION_POLLS &&
+    generation.results.some(
+      (r) => r.status === "completed" && r.stored_path && !r.renditions
+    );
+
+  useEffect(() => {
+    setRenditionPolls(0);
+  }, [generation?.id]);
+
   const { data: polledGeneration } = usePolling<Generation | null>(
     pollingFetcher,
     3000,
-    !!isActive
+    !!isActive || awaitingRenditions
   );
 
   useEffect(() => {
-    if (polledGeneration) setGeneration(polledGeneration);
+    if (!polledGeneration) return;
+    setGeneration(polledGeneration);
+    if (FINAL_STATUSES.includes(polledGeneration.status)) {
+      setRenditionPolls((n) => n + 1);
+    }
   }, [polledGeneration]);
 
   const handleUpload = useCallback(async (file: File) => {
@@ -157,6 +181,16 @@ export default function HomePage() {
     setView("form");
   };
 
+  const handleCancel = async () => {
+    if (!generation) return;
+    try {
+      setGeneration(await cancelGeneration(generation.id));
+      toast.success("생성을 취소했습니다");
+    } catch {
+      toast.error("생성 취소 실패");
+    }
+  };
+
   const handleBackToForm = useCallback(() => {
     // Navigate back via history if we pushed state, otherwise just switch
     if (window.history.state?.view === "result") {
@@ -179,6 +213,7 @@ export default function HomePage() {
         promptSummary={promptSummary}
         onBack={handleBackToForm}
         onNewGeneration={handleReset}
+        onCancel={handleCancel}
         selectedTargets={targets.filter((t) => selectedTargets.includes(t.id))}
       />
     );
@@ -292,7 +327,7 @@ export default function HomePage() {
                 className="flex items-center gap-4"
               >
                 <img
-                  src={getImageUrl(uploadedImage.stored_path)}
+                  src={getRenditionUrl(uploadedImage, "thumb")}
                   alt={uploadedImage.filename}
                   className="h-36 rounded-lg object-contain"
                 />
@@ -3,7 +3,7 @@
 import { useState, useEffect, useRef } from "react";
 import { motion, AnimatePresence } from "framer-motion";
 import { ImageCompare } from "@/components/image-compare";
-import { getImageUrl } from "@/lib/api";
+import { getRenditionUrl } from "@/lib/api";
 import type { GenerationResult, ImageFile } from "@/lib/types";
 
 /* ── Witty loading messages ── */
@@ -159,10 +159,12 @@ export function GenerationResultTabs({
   const startTimeRef = useRef(Date.now());
 
   const isActive =
-    generationStatus !== "completed" && generationStatus !== "failed";
+    generationStatus !== "completed" &&
+    generationStatus !== "failed" &&
+    generationStatus !== "cancelled";
 
   const completedCount = results.filter(
-    (r) => r.status === "completed" || r.status === "failed"
+    (r) => r.status === "completed" || r.status === "failed" || r.status === "cancelled"
   ).length;
   const totalCount = results.length;
 
@@ -203,6 +205,8 @@ export function GenerationResultTabs({
                     ? "bg-green-500"
                     : result.status === "failed"
                     ? "bg-red-500"
+                    : result.status === "cancelled"
+                    ? "bg-muted-foreground"
                     : "bg-blue-500 animate-pulse"
                 }`}
               />
@@ -234,9 +238,12 @@ export function GenerationResultTabs({
           {result.status === "completed" && result.stored_path ? (
             <ImageCompare
               originalSrc={
-                sourceImage ? getImageUrl(sourceImage.stored_path) : null
+                sourceImage ? getRenditionUrl(sourceImage, "medium") : null
               }
-              generatedSrc={getImageUrl(result.stored_path)}
+              generatedSrc={getRenditionUrl(
+                { stored_path: result.stored_path, renditions: result.renditions },
+                "medium"
+              )}
               rationale={result.rationale}
               adaptedText={result.adapted_text}
             />
@@ -249,6 +256,12 @@ export function GenerationResultTabs({
                 {result.error || "알 수 없는 오류가 발생했습니다."}
               </p>
             </div>
+          ) : result.status === "cancelled" ? (
+            <div className="rounded-xl border border-border/60 bg-muted/20 p-6 text-center">
+              <p className="text-sm font-medium text-muted-foreground">
+                생성 취소됨
+              </p>
+            </div>
           ) : (
             <TabLoadingPanel
               status={generationStatus}
@@ -71,6 +71,7 @@ interface GenerationResultViewProps {
   promptSummary: string;
   onBack: () => void;
   onNewGeneration: () => void;
+  onCancel: () => void;
   selectedTargets: Target[];
 }
 
@@ -80,9 +81,12 @@ export function GenerationResultView({
   promptSummary,
   onBack,
   onNewGeneration,
+  onCancel,
 }: GenerationResultViewProps) {
   const isFinished =
-    generation?.status === "completed" || generation?.status === "failed";
+    generation?.status === "completed" ||
+    generation?.status === "failed" ||
+    generation?.status === "cancelled";
 
   return (
     <motion.div
@@ -117,6 +121,11 @@ export function GenerationResultView({
         <p className="text-sm text-muted-foreground truncate max-w-md">
           {promptSummary}
         </p>
+        {generation && !isFinished && (
+          <Button onClick={onCancel} variant="ghost" size="sm" className="ml-auto">
+            취소
+          </Button>
+        )}
       </div>
 
       {/* Results tabs — single source of truth for target navigation + images + loading */}
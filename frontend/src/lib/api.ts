@@ -1,4 +1,11 @@
-import type { ImageFile, Target, Product, Generation } from "./types";
+import type {
+  ImageFile,
+  Target,
+  Product,
+  Generation,
+  Renditions,
+  RenditionSize,
+} from "./types";
 
 const BASE_URL = `${process.env.NEXT_PUBLIC_API_URL}/api/v1`;
 
@@ -15,6 +22,17 @@ export function getImageUrl(storedPath: string): string {
   return `${process.env.NEXT_PUBLIC_API_URL}/files/${storedPath}`;
 }
 
+// Prefer a WebP rendition of the given size; the original until it exists
+export function getRenditionUrl(
+  item: { stored_path: string; renditions: Renditions | null },
+  size: RenditionSize
+): string {
+  const url = item.renditions?.[size]?.webp;
+  return url
+    ? `${process.env.NEXT_PUBLIC_API_URL}${url}`
+    : getImageUrl(item.stored_path);
+}
+
 // Images
 export async function uploadImage(file: File): Promise<ImageFile> {
   const formData = new FormData();
@@ -115,6 +133,7 @@ export async function createGeneration(data: {
   product_ids?: number[];
   promotion_prompt?: string;
   design_style?: string;
+  priority?: "interactive" | "bulk";
 }): Promise<Generation> {
   return request<Generation>("/generations", {
     method: "POST",
@@ -126,3 +145,7 @@ export async function createGeneration(data: {
 export async function getGeneration(id: number): Promise<Generation> {
   return request<Generation>(`/generations/${id}`);
 }
+
+export async function cancelGeneration(id: number): Promise<Generation> {
+  return request<Generation>(`/generations/${id}/cancel`, { method: "POST" });
+}
@@ -5,12 +5,19 @@ export type DesignStyle =
   | "lifestyle"
   | "minimal_graphic";
 
+// Downsized WebP/AVIF copies, rendered in the background after upload/generation
+export type RenditionSize = "thumb" | "medium" | "full";
+export type Renditions = Partial<
+  Record<RenditionSize, Partial<Record<"webp" | "avif", string>>>
+>;
+
 export interface ImageFile {
   id: number;
   filename: string;
   stored_path: string;
   mime_type: string;
   size_bytes: number;
+  renditions: Renditions | null;
   created_at: string;
 }
 
@@ -43,11 +50,13 @@ export interface GenerationResult {
   id: number;
   generation_id: number;
   target_id: number;
-  status: "pending" | "generating" | "completed" | "failed";
+  status: "pending" | "generating" | "completed" | "failed" | "cancelled";
   stored_path: string | null;
   prompt_used: string | null;
   rationale: string | null;
   adapted_text: string | null;
+  reused_from_id: number | null;
+  renditions: Renditions | null;
   error: string | null;
   created_at: string;
   target: Target | null;
@@ -61,11 +70,21 @@ export interface Generation {
   promotion_prompt: string | null;
   design_style: string | null;
   mode: string;
-  status: "pending" | "analyzing" | "generating" | "completed" | "failed";
+  priority: "interactive" | "bulk";
+  reused_images: number;
+  status:
+    | "pending"
+    | "analyzing"
+    | "generating"
+    | "completed"
+    | "failed"
+    | "cancelled";
+  queue_position: number | null;
   model: string;
   analysis_result: string | null;
   error: string | null;
   created_at: string;
+  started_at: string | null;
   completed_at: string | null;
   results: GenerationResult[];
   source_image: ImageFile | null;